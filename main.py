@@ -1,34 +1,46 @@
+import sys
 import typer
-from src.tui.app import AgentCoderApp
 
-from src.models import AgentMode
+from src import __version__
 
 app = typer.Typer()
 
+# Kept as plain strings so building the CLI doesn't import src.models
+AGENT_MODES = ("auto", "plan", "ask")
+
 @app.callback()
-def callback():
+def callback(
+    version: bool = typer.Option(False, "--version", "-v", help="Show the version and exit"),
+):
     """
     Agent Coder CLI.
     """
+    # Normally answered by the fast path in main(); kept so it shows up in --help
+    if version:
+        typer.echo(__version__)
+        raise typer.Exit()
 
 @app.command()
 def start(
     query: str = typer.Argument(None, help="Optional query to start the session with"),
     model: str = typer.Option("gpt-oss:20b", help="Name of the model to use"),
     provider: str = typer.Option("ollama", help="Model provider: ollama, anthropic, google, openai"),
-    mode: AgentMode = typer.Option(AgentMode.AUTO, help="Agent mode: auto, plan, ask"),
+    mode: str = typer.Option("auto", help="Agent mode: auto, plan, ask"),
     lsp: bool = typer.Option(False, help="Enable LSP support"),
     lsp_command: str = typer.Option("pylsp", help="LSP server command"),
     print_mode: bool = typer.Option(False, "--print", "-p", help="Print response and exit (non-interactive)"),
 ):
     """Start the Agent Coder."""
+    mode = mode.lower()
+    if mode not in AGENT_MODES:
+        raise typer.BadParameter(f"must be one of: {', '.join(AGENT_MODES)}", param_hint="--mode")
+
     if print_mode:
         if not query:
             typer.echo("Error: --print mode requires a query.")
             raise typer.Exit(code=1)
         
         # Headless mode
-        import asyncio
         from src.config import Settings
         from src.agent.core import create_agent, get_agent_response
         
@@ -45,20 +57,37 @@ def start(
             response, _ = await get_agent_response(agent, query)
             print(response)
 
-        asyncio.run(run_headless())
+        try:
+            import uvloop
+        except ImportError:
+            import asyncio
+            asyncio.run(run_headless())
+        else:
+            uvloop.run(run_headless())
     else:
         # TUI mode
+        from src.tui.app import AgentCoderApp, install_uvloop
+
         tui = AgentCoderApp(
             model_name=model, 
             model_provider=provider, 
-            mode=mode.value, 
+            mode=mode, 
             initial_query=query,
             lsp_enabled=lsp,
             lsp_command=lsp_command
         )
+        # Startup objects live for the whole session; keep the GC from rescanning them
+        import gc
+        gc.collect()
+        gc.freeze()
+        install_uvloop()
         tui.run()
 
 def main():
+    # Answer version queries before Typer resolves any command signatures
+    if len(sys.argv) >= 2 and sys.argv[1] in ("-v", "--version"):
+        print(__version__)
+        return
     app()
 
 if __name__ == "__main__":
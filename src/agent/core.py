@@ -1,20 +1,199 @@
 import os
+import re
+import gc
+import asyncio
 import functools
 import inspect
+import httpx
 from pydantic_ai import Agent
-from pydantic_ai.models.openai import OpenAIModel
+from pydantic_ai.messages import PartDeltaEvent, PartStartEvent, TextPart, TextPartDelta
 
 from src.agent.tools import read_file, write_file, list_dir
 from src.agent.hooks import HookManager, HookEvent
+from src.agent.filecache import read_text_cached
 
-from typing import Callable, Awaitable, Optional, List, Any
+from typing import Callable, Awaitable, Optional, List, Any, Dict, Tuple
 from src.models import AgentMode
 from src.config import Settings
 
+# (model class, provider class) by provider, imported the first time each provider is used
+_MODEL_CLS_CACHE: Dict[str, Tuple[type, type]] = {}
+
+def _get_model_class(provider: str) -> Tuple[type, type]:
+    classes = _MODEL_CLS_CACHE.get(provider)
+    if classes is None:
+        if provider == 'ollama':
+            from pydantic_ai.models.openai import OpenAIModel
+            from pydantic_ai.providers.ollama import OllamaProvider
+            classes = (OpenAIModel, OllamaProvider)
+        elif provider in ('anthropic', 'claude'):
+            from pydantic_ai.models.anthropic import AnthropicModel
+            from pydantic_ai.providers.anthropic import AnthropicProvider
+            classes = (AnthropicModel, AnthropicProvider)
+        elif provider in ('google', 'gemini'):
+            from pydantic_ai.models.gemini import GeminiModel
+            from pydantic_ai.providers.google_gla import GoogleGLAProvider
+            classes = (GeminiModel, GoogleGLAProvider)
+        else:
+            # openai/gpt, and OpenAI compatible fallback for other providers
+            from pydantic_ai.models.openai import OpenAIModel
+            from pydantic_ai.providers.openai import OpenAIProvider
+            classes = (OpenAIModel, OpenAIProvider)
+        _MODEL_CLS_CACHE[provider] = classes
+    return classes
+
+# One connection pool shared by the main agent and all subagents, whatever the provider
+_SHARED_HTTP_CLIENT: Optional[httpx.AsyncClient] = None
+
+def _get_http_client() -> httpx.AsyncClient:
+    global _SHARED_HTTP_CLIENT
+    if _SHARED_HTTP_CLIENT is None or _SHARED_HTTP_CLIENT.is_closed:
+        # Same timeouts as pydantic-ai's default client, with a larger keep-alive pool for parallel subagents
+        _SHARED_HTTP_CLIENT = httpx.AsyncClient(
+            timeout=httpx.Timeout(timeout=600, connect=5),
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=32),
+        )
+    return _SHARED_HTTP_CLIENT
+
+async def close_http_client():
+    """Close the shared HTTP client; the next model built opens a new one."""
+    global _SHARED_HTTP_CLIENT
+    client, _SHARED_HTTP_CLIENT = _SHARED_HTTP_CLIENT, None
+    if client is not None:
+        await client.aclose()
+
+def _build_model(provider: str, model_name: str):
+    """Instantiate the pydantic-ai model for a (lowercased) provider name."""
+    model_cls, provider_cls = _get_model_class(provider)
+    return model_cls(model_name, provider=provider_cls(http_client=_get_http_client()))
+
+BASE_SYSTEM_PROMPT = (
+    'You are a helpful AI coding assistant. '
+    'You have access to file system tools. '
+    'When asked to create or modify a file, YOU MUST use the write_file tool. '
+    'Do not just describe what you would do, actually call the tool.'
+)
+PLAN_MODE_PROMPT = " You are in PLAN mode. You can read files but CANNOT write them. Propose a plan."
+
+# Static prompt/skill/subagent context, keyed on the mode and the on-disk mtimes it depends on
+_STATIC_CONTEXT_CACHE_SIZE = 8
+_static_context_cache: Dict[tuple, Tuple[str, Dict[str, Any], Dict[str, Any]]] = {}
+
+def _mtime(path: str) -> int:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return 0
+
+def _dirmtime(path: str) -> int:
+    """Latest mtime of a directory or anything under it (0 if it doesn't exist)."""
+    latest = _mtime(path)
+    if not latest:
+        return 0
+    for root, dirs, files in os.walk(path):
+        for name in dirs + files:
+            latest = max(latest, _mtime(os.path.join(root, name)))
+    return latest
+
+def _load_memory(path: str) -> str:
+    """Return the file's contents, re-reading only when its mtime changes ("" if missing)."""
+    try:
+        return read_text_cached(path)
+    except Exception:
+        return ""
+
+@functools.lru_cache(maxsize=16)
+def _skills_block(skills: Tuple[Tuple[str, str], ...]) -> str:
+    """Render the AVAILABLE SKILLS prompt section from (name, description) pairs."""
+    skills_list = "\n".join([f"- {name}: {description}" for name, description in skills])
+    return f"\n\nAVAILABLE SKILLS:\n{skills_list}\n\nTo use a skill, call the get_skill tool with the skill name to retrieve its instructions."
+
+def _build_static_context(settings: Settings) -> Tuple[str, Dict[str, Any], Dict[str, Any]]:
+    """Build the system prompt and load subagents/skills, reusing earlier results when nothing changed."""
+    cwd = os.getcwd()
+    key = (
+        cwd,
+        settings.mode.value,
+        _mtime(os.path.join(cwd, "AGENT_MEMORY.md")),
+        _dirmtime(os.path.join(cwd, ".agent-coder", "skills")),
+        _dirmtime(os.path.join(cwd, ".claude", "skills")),
+        _dirmtime(os.path.join(cwd, ".agent-coder", "agents")),
+        _dirmtime(os.path.join(cwd, ".claude", "agents")),
+    )
+    cached = _static_context_cache.get(key)
+    if cached is not None:
+        return cached
+
+    prompt_parts: List[str] = [BASE_SYSTEM_PROMPT]
+    
+    # Load project memory from AGENT_MEMORY.md
+    memory_content = _load_memory(os.path.join(cwd, "AGENT_MEMORY.md"))
+    if memory_content:
+        prompt_parts.append(f"\n\nPROJECT MEMORY (AGENT_MEMORY.md):\n{memory_content}")
+    
+    # Adjust system prompt based on mode
+    if settings.mode == AgentMode.PLAN:
+        prompt_parts.append(PLAN_MODE_PROMPT)
+
+    # Load subagents
+    from src.agent.subagents import load_subagents
+    subagents = load_subagents(settings)
+
+    # Load skills
+    from src.agent.skills import load_skills
+    skills = load_skills(settings)
+    
+    if skills:
+        prompt_parts.append(_skills_block(tuple((s.name, s.description) for s in skills.values())))
+
+    system_prompt = "".join(prompt_parts)
+
+    if len(_static_context_cache) >= _STATIC_CONTEXT_CACHE_SIZE:
+        _static_context_cache.pop(next(iter(_static_context_cache)))
+    result = (system_prompt, subagents, skills)
+    _static_context_cache[key] = result
+    return result
+
+def _batch_prompt(queries: List[str]) -> str:
+    """Combine independent queries into one prompt asking for numbered answers."""
+    questions = "\n---\n".join(f"Q{i}: {q}" for i, q in enumerate(queries, 1))
+    return (
+        f"Answer the following {len(queries)} independent questions.\n\n{questions}\n\n"
+        f"Answer each one separately, in order, starting each answer on its own line "
+        f"with its label (A1:, A2:, ...)."
+    )
+
+_BATCH_ANSWER_RE = re.compile(r"^\s*\**A(\d+)\**\s*:\**", re.MULTILINE)
+
+def _split_batch_answers(output: str, count: int) -> Optional[List[str]]:
+    """Split a response to _batch_prompt() into per-question answers, or None if it doesn't line up."""
+    parts = _BATCH_ANSWER_RE.split(output)
+    answers: Dict[int, str] = {}
+    # parts is [preamble, n1, text1, n2, text2, ...]
+    for number, text in zip(parts[1::2], parts[2::2]):
+        answers[int(number)] = text.strip().removesuffix("---").strip()
+    if sorted(answers) != list(range(1, count + 1)):
+        return None
+    return [answers[i] for i in range(1, count + 1)]
+
+_gc_frozen = False
+
+def _freeze_gc_once():
+    """Move the long-lived objects built by the first create_agent() out of the collector's way.
+
+    Only done once: frozen objects are never collected, so freezing after every
+    re-creation would pin each replaced agent's reference cycles.
+    """
+    global _gc_frozen
+    if not _gc_frozen:
+        _gc_frozen = True
+        gc.collect()
+        gc.freeze()
+
 def create_agent(
     settings: Settings,
     confirmation_callback: Optional[Callable[[str], Awaitable[bool]]] = None,
-    extra_tools: List[Any] = []
+    extra_tools: Optional[List[Any]] = None
 ) -> Agent:
     """Create an agent with the specified configuration."""
     # Set default Ollama base URL if not present
@@ -22,61 +201,74 @@ def create_agent(
         os.environ["OLLAMA_BASE_URL"] = settings.ollama_base_url
 
     # Select model based on provider
-    provider = settings.model_provider.lower()
-    
-    if provider == 'ollama':
-        model = OpenAIModel(
-            model_name=settings.model,
-            provider='ollama',
-        )
-    elif provider in ('anthropic', 'claude'):
-        from pydantic_ai.models.anthropic import AnthropicModel
-        model = AnthropicModel(settings.model)
-    elif provider in ('google', 'gemini'):
-        from pydantic_ai.models.gemini import GeminiModel
-        model = GeminiModel(settings.model)
-    elif provider in ('openai', 'gpt'):
-        model = OpenAIModel(settings.model)
-    else:
-        # Fallback to OpenAI compatible (e.g. for other providers)
-        model = OpenAIModel(settings.model)
+    model = _build_model(settings.model_provider.lower(), settings.model)
     
     # Initialize HookManager
     hook_manager = HookManager()
     
+    # Initialize LSP Manager
+    # Its hooks must be registered before any tool is wrapped, since wrap_tool checks for hooks up front
+    from src.agent.lsp_manager import LSPManager
+    lsp_manager = LSPManager(settings)
+    lsp_manager.start()
+    
+    # Register LSP hooks
+    if lsp_manager.client:
+        hook_manager.register(HookEvent.POST_TOOL_USE, lsp_manager.on_post_tool_use)
+    
+    # Register cleanup hook
+    async def cleanup_lsp(data):
+        await lsp_manager.stop()
+        
+    hook_manager.register(HookEvent.SESSION_END, cleanup_lsp)
+    
+    async def cleanup_http(data):
+        await close_http_client()
+        
+    hook_manager.register(HookEvent.SESSION_END, cleanup_http)
+    
+    pre_id = hook_manager.event_id(HookEvent.PRE_TOOL_USE)
+    post_id = hook_manager.event_id(HookEvent.POST_TOOL_USE)
+    
     # Helper to wrap tools with hooks
     def wrap_tool(tool: Callable) -> Callable:
-        is_async = inspect.iscoroutinefunction(tool)
+        # Resolved once per tool rather than on every call
+        has_pre = hook_manager.has(HookEvent.PRE_TOOL_USE)
+        has_post = hook_manager.has(HookEvent.POST_TOOL_USE)
+        if inspect.iscoroutinefunction(tool):
+            run = tool
+        else:
+            # Sync tools do blocking I/O, so run them in a worker thread
+            run = functools.partial(asyncio.to_thread, tool)
         
         @functools.wraps(tool)
         async def wrapped(*args, **kwargs):
             tool_name = tool.__name__
-            await hook_manager.trigger(HookEvent.PRE_TOOL_USE, {
-                "tool_name": tool_name,
-                "args": args,
-                "kwargs": kwargs
-            })
+            if has_pre:
+                await hook_manager.dispatch(pre_id, {
+                    "tool_name": tool_name,
+                    "args": args,
+                    "kwargs": kwargs
+                })
             
             try:
-                if is_async:
-                    result = await tool(*args, **kwargs)
-                else:
-                    result = tool(*args, **kwargs)
+                result = await run(*args, **kwargs)
             except Exception as e:
                 result = f"Error in tool {tool_name}: {str(e)}"
                 
-            await hook_manager.trigger(HookEvent.POST_TOOL_USE, {
-                "tool_name": tool_name,
-                "result": result,
-                "args": args,
-                "kwargs": kwargs
-            })
+            if has_post:
+                await hook_manager.dispatch(post_id, {
+                    "tool_name": tool_name,
+                    "result": result,
+                    "args": args,
+                    "kwargs": kwargs
+                })
             return result
             
         return wrapped
     
     current_tools = [wrap_tool(read_file), wrap_tool(list_dir)]
-    current_tools.extend([wrap_tool(t) for t in extra_tools])
+    current_tools.extend(wrap_tool(t) for t in extra_tools or ())
     
     if settings.mode == AgentMode.AUTO:
         current_tools.append(wrap_tool(write_file))
@@ -93,94 +285,100 @@ def create_agent(
                 confirmed = await confirmation_callback(f"Write to {path}?")
                 if not confirmed:
                     return "Action cancelled by user."
-            return write_file(path, content)
+            return await asyncio.to_thread(write_file, path, content)
             
         current_tools.append(wrap_tool(write_file_with_confirmation))
     
-    # Adjust system prompt based on mode
-    system_prompt = (
-        'You are a helpful AI coding assistant. '
-        'You have access to file system tools. '
-        'When asked to create or modify a file, YOU MUST use the write_file tool. '
-        'Do not just describe what you would do, actually call the tool.'
-    )
+    system_prompt, subagents, skills = _build_static_context(settings)
     
-    # Load project memory from AGENT_MEMORY.md
-    memory_path = os.path.join(os.getcwd(), "AGENT_MEMORY.md")
-    if os.path.exists(memory_path):
-        try:
-            with open(memory_path, "r") as f:
-                memory_content = f.read()
-            system_prompt += f"\n\nPROJECT MEMORY (AGENT_MEMORY.md):\n{memory_content}"
-        except Exception:
-            pass
+    # Subagents built so far, keyed on (provider, model, prompt)
+    sub_agents: Dict[Tuple[str, str, str], Agent] = {}
     
-    if settings.mode == AgentMode.PLAN:
-        system_prompt += " You are in PLAN mode. You can read files but CANNOT write them. Propose a plan."
-
-    # Load subagents
-    from src.agent.subagents import load_subagents
-    subagents = load_subagents(settings)
+    def _build_sub_agent(config) -> Agent:
+        # Inherit settings but override model if specified
+        sub_settings = settings.model_copy()
+        if config.model and config.model != 'inherit':
+            sub_settings.model = config.model
+        
+        sub_provider = sub_settings.model_provider.lower()
+        key = (sub_provider, sub_settings.model, config.prompt)
+        if key in sub_agents:
+            return sub_agents[key]
+            
+        # Determine tools for subagent
+        # For simplicity, we give subagents the same tools as the main agent for now
+        # In a real implementation, we would filter based on config.tools
+        
+        # Determine model for subagent
+        sub_model = _build_model(sub_provider, sub_settings.model)
+        
+        sub_agent = Agent(
+            sub_model,
+            system_prompt=config.prompt,
+            tools=current_tools
+        )
+        sub_agents[key] = sub_agent
+        return sub_agent
     
-    # Create tools for subagents
-    for name, config in subagents.items():
-        # Create a tool function for this subagent
+    def _make_subagent_tools(name: str, config) -> Tuple[Callable, Callable]:
+        # name/config are bound per call here; a closure in the loop below would see only the last subagent
+        sub_agent: Optional[Agent] = None
+        
+        async def run_sub_agent(prompt: str) -> str:
+            nonlocal sub_agent
+            # Built on first use so the subagent sees the complete tool list
+            if sub_agent is None:
+                sub_agent = _build_sub_agent(config)
+            result = await sub_agent.run(prompt)
+            await hook_manager.trigger(HookEvent.SUBAGENT_STOP, {
+                "subagent": name, 
+                "result": result.output
+            })
+            return result.output
+        
         async def subagent_tool(query: str) -> str:
             """Delegate a task to a specialized subagent."""
-            # Create a new agent instance for the subagent
-            # Inherit settings but override model if specified
-            sub_settings = settings.model_copy()
-            if config.model and config.model != 'inherit':
-                sub_settings.model = config.model
-                
-            # Determine tools for subagent
-            # For simplicity, we give subagents the same tools as the main agent for now
-            # In a real implementation, we would filter based on config.tools
-            
-            # Determine model for subagent
-            sub_provider = sub_settings.model_provider.lower()
-            if sub_provider == 'ollama':
-                sub_model = OpenAIModel(model_name=sub_settings.model, provider='ollama')
-            elif sub_provider in ('anthropic', 'claude'):
-                from pydantic_ai.models.anthropic import AnthropicModel
-                sub_model = AnthropicModel(sub_settings.model)
-            elif sub_provider in ('google', 'gemini'):
-                from pydantic_ai.models.gemini import GeminiModel
-                sub_model = GeminiModel(sub_settings.model)
-            elif sub_provider in ('openai', 'gpt'):
-                sub_model = OpenAIModel(sub_settings.model)
-            else:
-                sub_model = OpenAIModel(sub_settings.model)
-            
-            sub_agent = Agent(
-                sub_model,
-                system_prompt=config.prompt,
-                tools=current_tools
-            )
-            
             try:
-                result = await sub_agent.run(query)
-                await hook_manager.trigger(HookEvent.SUBAGENT_STOP, {
-                    "subagent": name, 
-                    "result": result.output
-                })
-                return f"Subagent {name} response:\n{result.output}"
+                output = await run_sub_agent(query)
+                return f"Subagent {name} response:\n{output}"
             except Exception as e:
                 return f"Error running subagent {name}: {str(e)}"
         
+        async def run_batch(queries: List[str]) -> List[str]:
+            # One run answers every query, sharing the system prompt; fall back to separate runs
+            # if the answers can't be matched back up
+            if len(queries) == 1:
+                return [await run_sub_agent(queries[0])]
+            answers = _split_batch_answers(await run_sub_agent(_batch_prompt(queries)), len(queries))
+            if answers is None:
+                answers = await asyncio.gather(*(run_sub_agent(q) for q in queries))
+            return list(answers)
+        
+        async def subagent_batch_tool(queries: List[str]) -> List[str]:
+            """Delegate several independent tasks to a specialized subagent at once."""
+            if len(queries) <= 1:
+                return [await subagent_tool(q) for q in queries]
+            try:
+                size = max(1, settings.subagent_max_batch)
+                chunks = [queries[i:i + size] for i in range(0, len(queries), size)]
+                results = await asyncio.gather(*(run_batch(chunk) for chunk in chunks))
+                return [f"Subagent {name} response:\n{answer}" for chunk in results for answer in chunk]
+            except Exception as e:
+                return [f"Error running subagent {name}: {str(e)}"] * len(queries)
+        
         # Rename the function to match the subagent name (sanitized)
-        subagent_tool.__name__ = f"delegate_to_{name.replace('-', '_')}"
+        tool_name = f"delegate_to_{name.replace('-', '_')}"
+        subagent_tool.__name__ = tool_name
         subagent_tool.__doc__ = f"Delegate to {name}: {config.description}"
-        current_tools.append(wrap_tool(subagent_tool))
-
-    # Load skills
-    from src.agent.skills import load_skills
-    skills = load_skills(settings)
+        subagent_batch_tool.__name__ = f"{tool_name}_batch"
+        subagent_batch_tool.__doc__ = f"Delegate several independent queries to {name} in one call: {config.description}"
+        return subagent_tool, subagent_batch_tool
     
+    # Create tools for subagents
+    for name, config in subagents.items():
+        current_tools.extend(wrap_tool(t) for t in _make_subagent_tools(name, config))
+
     if skills:
-        skills_list = "\n".join([f"- {s.name}: {s.description}" for s in skills.values()])
-        system_prompt += f"\n\nAVAILABLE SKILLS:\n{skills_list}\n\nTo use a skill, call the get_skill tool with the skill name to retrieve its instructions."
-        
         def get_skill(name: str) -> str:
             """Retrieve the instructions for a specific skill."""
             if name in skills:
@@ -189,22 +387,8 @@ def create_agent(
             
         current_tools.append(wrap_tool(get_skill))
 
-    # Initialize LSP Manager
-    from src.agent.lsp_manager import LSPManager
-    lsp_manager = LSPManager(settings)
-    lsp_manager.start()
-    
     # Register LSP tools
-    current_tools.extend([wrap_tool(t) for t in lsp_manager.tools])
-    
-    # Register LSP hooks
-    hook_manager.register(HookEvent.POST_TOOL_USE, lsp_manager.on_post_tool_use)
-    
-    # Register cleanup hook
-    async def cleanup_lsp(data):
-        lsp_manager.stop()
-        
-    hook_manager.register(HookEvent.SESSION_END, cleanup_lsp)
+    current_tools.extend(wrap_tool(t) for t in lsp_manager.tools)
 
     agent = Agent(
         model,
@@ -212,16 +396,73 @@ def create_agent(
         tools=current_tools,
     )
     
+    # /memory additions made during the session. Instructions are re-evaluated on every run,
+    # so these apply immediately instead of waiting for the agent to be rebuilt.
+    memory_additions: List[str] = []
+
+    @agent.instructions
+    def added_memory() -> str:
+        if not memory_additions:
+            return ""
+        return "PROJECT MEMORY ADDITIONS:\n" + "\n".join(f"- {line}" for line in memory_additions)
+
     agent.hook_manager = hook_manager
+    agent.lsp_manager = lsp_manager
+    agent.append_memory = memory_additions.append
+    _freeze_gc_once()
     return agent
 
 async def get_agent_response(agent: Agent, user_input: str, message_history: Optional[List[Any]] = None) -> tuple[str, List[Any]]:
     """Get a response from the agent, maintaining history."""
+    # Nothing to send: skip the hooks and the model round-trip
+    if not user_input or not user_input.strip():
+        return "", message_history or []
+    
     try:
         if hasattr(agent, 'hook_manager'):
             await agent.hook_manager.trigger(HookEvent.USER_PROMPT_SUBMIT, {"user_input": user_input})
             
         result = await agent.run(user_input, message_history=message_history)
-        return result.data, result.all_messages()
+        return result.output, result.all_messages()
+    except Exception as e:
+        return f"Error communicating with agent: {str(e)}", message_history or []
+
+async def stream_agent_response(
+    agent: Agent,
+    user_input: str,
+    message_history: Optional[List[Any]] = None,
+    on_text: Optional[Callable[[str], None]] = None,
+) -> tuple[str, List[Any]]:
+    """Like get_agent_response, but passes the text of every model response to on_text as it streams in."""
+    if not user_input or not user_input.strip():
+        return "", message_history or []
+    
+    try:
+        if hasattr(agent, 'hook_manager'):
+            await agent.hook_manager.trigger(HookEvent.USER_PROMPT_SUBMIT, {"user_input": user_input})
+            
+        # agent.run_stream() would end the run at the first text, dropping any tool
+        # calls that follow it; a full run with an event handler keeps the tool loop
+        # going and still hands over the text as it streams in
+        parts: List[str] = []
+        
+        async def forward_text(ctx, events) -> None:
+            async for event in events:
+                if isinstance(event, PartStartEvent) and isinstance(event.part, TextPart):
+                    text = event.part.content
+                    # Text from a later model response starts on its own line
+                    if parts and not parts[-1].endswith("\n"):
+                        text = "\n" + text
+                elif isinstance(event, PartDeltaEvent) and isinstance(event.delta, TextPartDelta):
+                    text = event.delta.content_delta
+                else:
+                    continue
+                if text:
+                    parts.append(text)
+                    if on_text:
+                        on_text(text)
+        
+        result = await agent.run(user_input, message_history=message_history, event_stream_handler=forward_text)
+        return result.output, result.all_messages()
     except Exception as e:
         return f"Error communicating with agent: {str(e)}", message_history or []
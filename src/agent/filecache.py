@@ -0,0 +1,34 @@
+import os
+from typing import Callable, Dict, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+def mtime_cached(cache: Dict[str, Tuple[int, T]], path: str, load: Callable[[str], T], mtime: Optional[int] = None) -> T:
+    """Return load(path), reusing the cached result until the file's mtime changes.
+
+    Raises OSError (and forgets the cached result) if the file can't be stat'ed.
+    Callers that already have the mtime, e.g. from os.scandir(), can pass it in.
+    """
+    if mtime is None:
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            cache.pop(path, None)
+            raise
+    cached = cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    value = load(path)
+    cache[path] = (mtime, value)
+    return value
+
+def _read_text(path: str) -> str:
+    with open(path, "r") as f:
+        return f.read()
+
+# Text file contents by path, shared by everyone reading the same files
+_text_cache: Dict[str, Tuple[int, str]] = {}
+
+def read_text_cached(path: str) -> str:
+    """Return a text file's contents, re-reading only when its mtime changes."""
+    return mtime_cached(_text_cache, path, _read_text)
@@ -1,11 +1,18 @@
 import os
+import sys
 import json
+import shlex
 import subprocess
 import asyncio
-from typing import Dict, List, Optional, Any, Union
-from pydantic import BaseModel, Field
+from typing import Dict, List, Optional, Any, Union, Callable, Awaitable, Tuple
+import msgspec
 from enum import Enum
 
+try:
+    import orjson
+except ImportError:  # optional, `pip install agent-coder[fast]`
+    orjson = None
+
 class HookEvent(str, Enum):
     PRE_TOOL_USE = "PreToolUse"
     POST_TOOL_USE = "PostToolUse"
@@ -19,81 +26,248 @@ class HookEvent(str, Enum):
 class HookType(str, Enum):
     COMMAND = "command"
 
-class HookAction(BaseModel):
+# Plain msgspec structs: this schema only ever decodes hooks.json, which
+# doesn't need pydantic's validation machinery
+class HookAction(msgspec.Struct):
     type: HookType
     command: str
+    # Keep one process running for the session, fed one JSON line per event
+    streaming: bool = False
 
-class HookRule(BaseModel):
+class HookRule(msgspec.Struct, kw_only=True):
     matcher: Optional[str] = None # For tool name matching, etc.
     hooks: List[HookAction]
 
-class HookConfig(BaseModel):
-    hooks: Dict[HookEvent, List[HookRule]] = Field(default_factory=dict)
+class HookConfig(msgspec.Struct):
+    hooks: Dict[HookEvent, List[HookRule]] = {}
+
+# Per event: (actions for each named tool, actions for any other tool, every action),
+# each list in hooks.json order
+HookIndex = Tuple[Dict[str, List[HookAction]], List[HookAction], List[HookAction]]
+
+# Characters that need a shell when they appear outside quotes
+_SHELL_CHARS = frozenset("|&;<>()$`*?[]{}~!#\n")
+# Still expanded by the shell inside double quotes
+_DQUOTE_SHELL_CHARS = frozenset("$`\\")
+# Commands that only exist inside the shell
+_SHELL_BUILTINS = frozenset((
+    ".", ":", "alias", "bg", "cd", "command", "eval", "exec", "exit", "export",
+    "fg", "jobs", "read", "readonly", "return", "set", "shift", "source",
+    "trap", "type", "ulimit", "umask", "unalias", "unset", "wait",
+))
+
+def _command_argv(command: str) -> Optional[List[str]]:
+    """Split a hook command for exec, or return None if it relies on shell syntax."""
+    quote = None
+    for ch in command:
+        if quote == "'":
+            if ch == "'":
+                quote = None
+        elif quote == '"':
+            if ch == '"':
+                quote = None
+            elif ch in _DQUOTE_SHELL_CHARS:
+                return None
+        elif ch in ("'", '"'):
+            quote = ch
+        elif ch in _SHELL_CHARS:
+            return None
+    try:
+        argv = shlex.split(command)
+    except ValueError:
+        return None
+    if not argv or argv[0] in _SHELL_BUILTINS:
+        return None
+    # A leading NAME=value sets the environment for the command
+    name, eq, _ = argv[0].partition("=")
+    if eq and name.isidentifier():
+        return None
+    return argv
+
+# How long a streaming hook worker may take to answer one event
+_STREAMING_TIMEOUT = 30.0
+
+async def _spawn_command(command: str, stderr: int = asyncio.subprocess.PIPE) -> asyncio.subprocess.Process:
+    pipes = dict(stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=stderr)
+    argv = _command_argv(command)
+    if argv:
+        # Skip /bin/sh for plain commands
+        return await asyncio.create_subprocess_exec(*argv, **pipes)
+    return await asyncio.create_subprocess_shell(command, **pipes)
+
+_EMPTY_INDEX: HookIndex = ({}, [], [])
+
+# Dense ids for HookEvent so per-event state lives in lists. HookEvent's hash goes
+# through Enum.__hash__ in Python, so hot callers resolve the id once via event_id()
+_EVENTS: Tuple[HookEvent, ...] = tuple(HookEvent)
+_EVENT_IDS: Dict[HookEvent, int] = {e: i for i, e in enumerate(_EVENTS)}
+_SESSION_END_ID = _EVENT_IDS[HookEvent.SESSION_END]
 
 class HookManager:
     def __init__(self, config_path: Optional[str] = None):
-        self.config = HookConfig()
+        # Parsed on first use; see _ensure_loaded()
+        self.config: Optional[HookConfig] = None
+        self._loaded = False
         self.cwd = os.getcwd()
+        self._index: List[HookIndex] = [_EMPTY_INDEX] * len(_EVENTS)
+        self._callbacks: List[List[Callable[[Dict[str, Any]], Awaitable[Any]]]] = [[] for _ in _EVENTS]
+        # Long-lived processes for streaming hook commands, keyed on the command
+        self._workers: Dict[str, asyncio.subprocess.Process] = {}
+        self._worker_locks: Dict[str, asyncio.Lock] = {}
         if config_path and os.path.exists(config_path):
-            self.load_config(config_path)
+            self._pending_paths = [config_path]
         else:
             # Try default locations
             default_paths = [
                 os.path.join(self.cwd, ".agent-coder", "hooks.json"),
                 os.path.join(self.cwd, ".claude", "hooks.json")
             ]
-            for path in default_paths:
-                if os.path.exists(path):
-                    self.load_config(path)
-                    break
+            self._pending_paths = [p for p in default_paths if os.path.exists(p)]
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if self._pending_paths:
+            self.load_config(self._pending_paths[0])
+        if self.config is None:
+            self.config = HookConfig()
 
     def load_config(self, path: str):
+        self._loaded = True
         try:
-            with open(path, "r") as f:
-                data = json.load(f)
-            self.config = HookConfig(**data)
+            with open(path, "rb") as f:
+                self.config = msgspec.json.decode(f.read(), type=HookConfig)
+            self._index = self._build_index(self.config)
             print(f"Loaded hooks from {path}")
         except Exception as e:
             print(f"Error loading hooks from {path}: {e}")
 
+    @staticmethod
+    def _build_index(config: HookConfig) -> List[HookIndex]:
+        """Resolve rule matchers once, into a list indexed by event id."""
+        index: List[HookIndex] = [_EMPTY_INDEX] * len(_EVENTS)
+        for event, rules in config.hooks.items():
+            by_name: Dict[str, List[HookAction]] = {}
+            wildcard: List[HookAction] = []
+            every: List[HookAction] = []
+            for rule in rules:
+                if rule.matcher in (None, "", "*"):
+                    # Applies to every tool, including ones named by earlier rules
+                    wildcard.extend(rule.hooks)
+                    for actions in by_name.values():
+                        actions.extend(rule.hooks)
+                else:
+                    # A tool first named here inherits the wildcard actions before it
+                    by_name.setdefault(sys.intern(rule.matcher), list(wildcard)).extend(rule.hooks)
+                every.extend(rule.hooks)
+            index[_EVENT_IDS[event]] = (by_name, wildcard, every)
+        return index
+
+    @staticmethod
+    def event_id(event: HookEvent) -> int:
+        """Id to pass to dispatch() instead of the enum."""
+        return _EVENT_IDS[event]
+
+    def register(self, event: HookEvent, callback: Callable[[Dict[str, Any]], Awaitable[Any]]):
+        """Register an in-process coroutine to run when the event fires."""
+        self._callbacks[_EVENT_IDS[event]].append(callback)
+
+    def has(self, event: HookEvent) -> bool:
+        """Whether anything would run for the event."""
+        self._ensure_loaded()
+        event_id = _EVENT_IDS[event]
+        return bool(self._index[event_id][2] or self._callbacks[event_id])
+
     async def trigger(self, event: HookEvent, context: Dict[str, Any]):
-        if event not in self.config.hooks:
-            return
+        await self.dispatch(_EVENT_IDS[event], context)
 
-        rules = self.config.hooks[event]
-        for rule in rules:
-            if self._matches(rule, context):
-                await self._execute_hooks(rule.hooks, context)
-
-    def _matches(self, rule: HookRule, context: Dict[str, Any]) -> bool:
-        if not rule.matcher:
-            return True
-        
-        # Simple matching logic
-        # For PreToolUse/PostToolUse, matcher checks tool name
+    async def dispatch(self, event_id: int, context: Dict[str, Any]):
+        """trigger() for an event already resolved with event_id()."""
+        self._ensure_loaded()
+        by_name, wildcard, every = self._index[event_id]
+        # Matchers only filter on tool name; other events run every rule
         if "tool_name" in context:
-            return rule.matcher == context["tool_name"] or rule.matcher == "*"
-            
-        return True
+            actions = by_name.get(context["tool_name"], wildcard)
+        else:
+            actions = every
+        if actions:
+            await self._execute_hooks(actions, context)
+
+        for callback in self._callbacks[event_id]:
+            try:
+                await callback(context)
+            except Exception as e:
+                print(f"Error in {_EVENTS[event_id].value} hook callback: {e}")
+
+        if event_id == _SESSION_END_ID:
+            await self.aclose()
+
+    async def aclose(self):
+        """Stop any streaming hook processes."""
+        workers, self._workers = self._workers, {}
+        for process in workers.values():
+            if process.returncode is None:
+                if process.stdin:
+                    process.stdin.close()
+                try:
+                    await asyncio.wait_for(process.wait(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    process.terminate()
+                    await process.wait()
+
+    async def _run_streaming(self, command: str, payload: bytes) -> bytes:
+        """Send one event to the command's worker process and return its reply line."""
+        lock = self._worker_locks.setdefault(command, asyncio.Lock())
+        async with lock:
+            process = self._workers.get(command)
+            if process is None or process.returncode is not None:
+                # Nothing reads a long-lived worker's stderr, so a full pipe would block it
+                process = await _spawn_command(command, stderr=asyncio.subprocess.DEVNULL)
+                self._workers[command] = process
+            try:
+                process.stdin.write(payload + b"\n")
+                async with asyncio.timeout(_STREAMING_TIMEOUT):
+                    await process.stdin.drain()
+                    line = await process.stdout.readline()
+            except TimeoutError:
+                # Hung worker; the next event starts a fresh one
+                self._workers.pop(command, None)
+                if process.returncode is None:
+                    process.kill()
+                await process.wait()
+                raise RuntimeError(f"streaming hook did not reply within {_STREAMING_TIMEOUT:g}s")
+            except ConnectionError:
+                line = b""
+            if not line:
+                # Worker exited; the next event starts a fresh one
+                self._workers.pop(command, None)
+                raise RuntimeError(f"streaming hook exited with code {await process.wait()}")
+            return line
 
     async def _execute_hooks(self, actions: List[HookAction], context: Dict[str, Any]):
-        # Prepare input JSON for the hook
-        hook_input = json.dumps({
+        # Prepare input JSON for the hook, encoded once for every action
+        hook_input = {
             "cwd": self.cwd,
             **context
-        })
+        }
+        if orjson is not None:
+            payload = orjson.dumps(hook_input)
+        else:
+            payload = json.dumps(hook_input).encode()
 
         for action in actions:
             if action.type == HookType.COMMAND:
                 try:
+                    if action.streaming:
+                        stdout = await self._run_streaming(action.command, payload)
+                        if stdout.strip():
+                            print(f"Hook output: {stdout.decode()}")
+                        continue
+                    
                     # Run the command
-                    process = await asyncio.create_subprocess_shell(
-                        action.command,
-                        stdin=asyncio.subprocess.PIPE,
-                        stdout=asyncio.subprocess.PIPE,
-                        stderr=asyncio.subprocess.PIPE
-                    )
-                    stdout, stderr = await process.communicate(input=hook_input.encode())
+                    process = await _spawn_command(action.command)
+                    stdout, stderr = await process.communicate(input=payload)
                     
                     if process.returncode != 0:
                         print(f"Hook command '{action.command}' failed with code {process.returncode}")
@@ -1,44 +1,82 @@
 import os
 import json
-import subprocess
-import threading
-import time
-from typing import Dict, Any, Optional, List
+import asyncio
+import itertools
+from typing import Dict, Any, Optional, List, Tuple
+
+try:
+    import orjson
+except ImportError:  # optional, `pip install agent-coder[fast]`
+    orjson = None
+
+# Results handed to the model are kept compact; indentation only costs tokens
+if orjson is not None:
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+
+    def _compact(result: Any) -> str:
+        return orjson.dumps(result).decode()
+else:
+    def _dumps(data: Any) -> bytes:
+        return json.dumps(data, separators=(",", ":")).encode('utf-8')
+
+    _loads = json.loads
+
+    def _compact(result: Any) -> str:
+        return json.dumps(result, separators=(",", ":"))
+
+# Large replies (e.g. references across a project) fit in the stream buffer
+# without the transport pausing and resuming the pipe every 128 KiB
+_READ_LIMIT = 1024 * 1024
+
+# Frames queued during one write are coalesced into the next, up to this size
+_WRITE_COALESCE = 64 * 1024
 
 class JSONRPCClient:
     def __init__(self, command: List[str], cwd: str):
         self.command = command
         self.cwd = cwd
-        self.process = None
-        self.request_id = 0
-        self.pending_requests: Dict[int, Any] = {}
-        self.lock = threading.Lock()
+        self.process: Optional[asyncio.subprocess.Process] = None
+        # Only touched from the event loop thread, so no lock is needed
+        self._next_id = itertools.count()
+        self.pending_requests: Dict[int, asyncio.Future] = {}
         self.running = False
+        self._reader_task: Optional[asyncio.Task] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._outq: "asyncio.Queue[bytes]" = asyncio.Queue()
         
-    def start(self):
-        self.process = subprocess.Popen(
-            self.command,
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
+    async def start(self):
+        self.process = await asyncio.create_subprocess_exec(
+            *self.command,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            # Nothing reads stderr; a full pipe would block the server
+            stderr=asyncio.subprocess.DEVNULL,
             cwd=self.cwd,
-            bufsize=0
+            limit=_READ_LIMIT
         )
         self.running = True
-        self.reader_thread = threading.Thread(target=self._read_loop, daemon=True)
-        self.reader_thread.start()
+        self._reader_task = asyncio.create_task(self._reader())
+        self._writer_task = asyncio.create_task(self._writer())
         
-    def stop(self):
+    async def stop(self):
         self.running = False
+        if self._reader_task:
+            self._reader_task.cancel()
+            self._reader_task = None
+        if self._writer_task:
+            self._writer_task.cancel()
+            self._writer_task = None
         if self.process:
-            self.process.terminate()
+            if self.process.returncode is None:
+                self.process.terminate()
+                await self.process.wait()
             self.process = None
+        self._fail_pending(ConnectionError("LSP server stopped"))
+
+    def _new_request(self, method: str, params: Any) -> Tuple[Dict[str, Any], asyncio.Future]:
+        req_id = next(self._next_id)
 
-    def send_request(self, method: str, params: Any) -> Any:
-        with self.lock:
-            req_id = self.request_id
-            self.request_id += 1
-            
         request = {
             "jsonrpc": "2.0",
             "id": req_id,
@@ -46,81 +84,116 @@ class JSONRPCClient:
             "params": params
         }
         
-        future = threading.Event()
-        result_container = {}
-        
-        with self.lock:
-            self.pending_requests[req_id] = (future, result_container)
-            
-        self._send(request)
-        
-        if not future.wait(timeout=10.0):
-            with self.lock:
-                del self.pending_requests[req_id]
-            raise TimeoutError(f"LSP request {method} timed out")
+        future = asyncio.get_running_loop().create_future()
+        self.pending_requests[req_id] = future
+        return request, future
+
+    async def _wait_response(self, request: Dict[str, Any], future: asyncio.Future) -> Any:
+        try:
+            message = await asyncio.wait_for(future, timeout=10.0)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"LSP request {request['method']} timed out")
+        finally:
+            self.pending_requests.pop(request["id"], None)
             
-        if "error" in result_container:
-            raise Exception(f"LSP Error: {result_container['error']}")
+        if "error" in message:
+            raise Exception(f"LSP Error: {message['error']}")
             
-        return result_container.get("result")
+        return message.get("result")
+
+    async def send_request(self, method: str, params: Any) -> Any:
+        request, future = self._new_request(method, params)
+        await self._send(request)
+        return await self._wait_response(request, future)
 
-    def send_notification(self, method: str, params: Any):
+    async def send_batch(self, calls: List[Tuple[str, Any]]) -> List[Any]:
+        """Send several requests in one write and wait for all of their results."""
+        pending = [self._new_request(method, params) for method, params in calls]
+        # LSP servers don't accept JSON-RPC batch arrays, so the requests are
+        # pipelined as consecutive frames instead
+        await self._write(b"".join(self._frame(request) for request, _ in pending))
+        return await asyncio.gather(
+            *(self._wait_response(request, future) for request, future in pending),
+            return_exceptions=True
+        )
+
+    async def send_notification(self, method: str, params: Any):
         request = {
             "jsonrpc": "2.0",
             "method": method,
             "params": params
         }
-        self._send(request)
+        await self._send(request)
+
+    def _frame(self, data: Dict[str, Any]) -> bytes:
+        content = _dumps(data)
+        return b"Content-Length: %d\r\n\r\n%s" % (len(content), content)
+
+    async def _send(self, data: Dict[str, Any]):
+        await self._write(self._frame(data))
 
-    def _send(self, data: Dict[str, Any]):
-        content = json.dumps(data)
-        header = f"Content-Length: {len(content)}\r\n\r\n"
+    async def _write(self, data: bytes):
+        # All writes go through the writer task, which keeps frames in order
         if self.process and self.process.stdin:
+            await self._outq.put(data)
+
+    async def _writer(self):
+        stdin = self.process.stdin
+        while True:
+            batch = [await self._outq.get()]
+            size = len(batch[0])
+            while size < _WRITE_COALESCE and not self._outq.empty():
+                data = self._outq.get_nowait()
+                batch.append(data)
+                size += len(data)
             try:
-                self.process.stdin.write(header.encode('utf-8'))
-                self.process.stdin.write(content.encode('utf-8'))
-                self.process.stdin.flush()
-            except BrokenPipeError:
+                stdin.write(b"".join(batch))
+                await stdin.drain()
+            except (BrokenPipeError, ConnectionResetError):
                 pass
 
-    def _read_loop(self):
-        while self.running and self.process:
+    async def _reader(self):
+        stdout = self.process.stdout
+        while self.running:
             try:
-                # Read header
-                line = self.process.stdout.readline()
-                if not line:
-                    break
-                
-                line = line.decode('utf-8').strip()
-                if not line.startswith("Content-Length:"):
+                # Read headers
+                header = await stdout.readuntil(b"\r\n\r\n")
+                length = None
+                for line in header.decode('utf-8').split("\r\n"):
+                    if line.lower().startswith("content-length:"):
+                        length = int(line.split(":", 1)[1].strip())
+                if length is None:
                     continue
-                    
-                length = int(line.split(":")[1].strip())
-                
-                # Skip empty line
-                self.process.stdout.readline()
                 
                 # Read body
-                body = self.process.stdout.read(length)
-                if not body:
-                    break
-                    
-                message = json.loads(body.decode('utf-8'))
-                
-                if "id" in message and message["id"] is not None:
-                    with self.lock:
-                        if message["id"] in self.pending_requests:
-                            future, container = self.pending_requests[message["id"]]
-                            if "error" in message:
-                                container["error"] = message["error"]
-                            else:
-                                container["result"] = message.get("result")
-                            future.set()
-                            del self.pending_requests[message["id"]]
+                body = await stdout.readexactly(length)
+                message = _loads(body)
+                self._dispatch(message)
                             
+            except asyncio.CancelledError:
+                raise
+            except asyncio.IncompleteReadError:
+                break
             except Exception as e:
                 print(f"LSP Read Error: {e}")
                 break
+        self._fail_pending(ConnectionError("LSP server closed the connection"))
+
+    def _dispatch(self, message: Any):
+        if isinstance(message, list):
+            for item in message:
+                self._dispatch(item)
+            return
+        if "id" in message and message["id"] is not None:
+            future = self.pending_requests.pop(message["id"], None)
+            if future and not future.done():
+                future.set_result(message)
+
+    def _fail_pending(self, error: Exception):
+        for future in self.pending_requests.values():
+            if not future.done():
+                future.set_exception(error)
+        self.pending_requests.clear()
 
 class LSPClient(JSONRPCClient):
     def __init__(self, command: List[str], root_uri: str):
@@ -128,8 +201,8 @@ class LSPClient(JSONRPCClient):
         self.root_uri = root_uri
         self.capabilities = {}
         
-    def initialize(self):
-        self.start()
+    async def initialize(self):
+        await self.start()
         params = {
             "processId": os.getpid(),
             "rootUri": self.root_uri,
@@ -143,12 +216,12 @@ class LSPClient(JSONRPCClient):
                 }
             }
         }
-        result = self.send_request("initialize", params)
+        result = await self.send_request("initialize", params)
         self.capabilities = result.get("capabilities", {})
-        self.send_notification("initialized", {})
+        await self.send_notification("initialized", {})
         return result
 
-    def did_open(self, file_path: str, content: str, language_id: str = "python"):
+    async def did_open(self, file_path: str, content: str, language_id: str = "python"):
         uri = f"file://{file_path}"
         params = {
             "textDocument": {
@@ -158,24 +231,39 @@ class LSPClient(JSONRPCClient):
                 "text": content
             }
         }
-        self.send_notification("textDocument/didOpen", params)
+        await self.send_notification("textDocument/didOpen", params)
 
-    def did_save(self, file_path: str):
+    async def did_change(self, file_path: str, content: str, version: int):
+        uri = f"file://{file_path}"
+        params = {
+            "textDocument": {
+                "uri": uri,
+                "version": version
+            },
+            "contentChanges": [{"text": content}]
+        }
+        await self.send_notification("textDocument/didChange", params)
+
+    async def did_save(self, file_path: str):
         uri = f"file://{file_path}"
         params = {
             "textDocument": {
                 "uri": uri
             }
         }
-        self.send_notification("textDocument/didSave", params)
+        await self.send_notification("textDocument/didSave", params)
 
-    def hover(self, file_path: str, line: int, character: int) -> str:
+    async def hover(self, file_path: str, line: int, character: int) -> str:
         uri = f"file://{file_path}"
         params = {
             "textDocument": {"uri": uri},
             "position": {"line": line - 1, "character": character}
         }
-        result = self.send_request("textDocument/hover", params)
+        result = await self.send_request("textDocument/hover", params)
+        return self._format_hover(result)
+
+    @staticmethod
+    def _format_hover(result: Any) -> str:
         if result and "contents" in result:
             contents = result["contents"]
             if isinstance(contents, dict) and "value" in contents:
@@ -185,31 +273,50 @@ class LSPClient(JSONRPCClient):
             return str(contents)
         return "No hover info."
 
-    def definition(self, file_path: str, line: int, character: int) -> str:
+    async def definition(self, file_path: str, line: int, character: int) -> str:
         uri = f"file://{file_path}"
         params = {
             "textDocument": {"uri": uri},
             "position": {"line": line - 1, "character": character}
         }
-        result = self.send_request("textDocument/definition", params)
-        return json.dumps(result, indent=2)
+        result = await self.send_request("textDocument/definition", params)
+        return _compact(result)
 
-    def references(self, file_path: str, line: int, character: int) -> str:
+    async def references(self, file_path: str, line: int, character: int) -> str:
         uri = f"file://{file_path}"
         params = {
             "textDocument": {"uri": uri},
             "position": {"line": line - 1, "character": character},
             "context": {"includeDeclaration": True}
         }
-        result = self.send_request("textDocument/references", params)
-        return json.dumps(result, indent=2)
+        result = await self.send_request("textDocument/references", params)
+        return _compact(result)
 
-    def rename(self, file_path: str, line: int, character: int, new_name: str) -> str:
+    async def rename(self, file_path: str, line: int, character: int, new_name: str) -> str:
         uri = f"file://{file_path}"
         params = {
             "textDocument": {"uri": uri},
             "position": {"line": line - 1, "character": character},
             "newName": new_name
         }
-        result = self.send_request("textDocument/rename", params)
-        return json.dumps(result, indent=2)
+        result = await self.send_request("textDocument/rename", params)
+        return _compact(result)
+
+    async def symbol_info(self, file_path: str, line: int, character: int) -> Dict[str, str]:
+        """Fetch hover, definition and references for one position in a single send."""
+        uri = f"file://{file_path}"
+        position = {"line": line - 1, "character": character}
+        hover, definition, references = await self.send_batch([
+            ("textDocument/hover", {"textDocument": {"uri": uri}, "position": position}),
+            ("textDocument/definition", {"textDocument": {"uri": uri}, "position": position}),
+            ("textDocument/references", {
+                "textDocument": {"uri": uri},
+                "position": position,
+                "context": {"includeDeclaration": True}
+            }),
+        ])
+        return {
+            "hover": str(hover) if isinstance(hover, Exception) else self._format_hover(hover),
+            "definition": str(definition) if isinstance(definition, Exception) else _compact(definition),
+            "references": str(references) if isinstance(references, Exception) else _compact(references),
+        }
@@ -1,91 +1,188 @@
 import os
 import shlex
-from typing import List, Any, Callable, Optional
+import asyncio
+from typing import List, Any, Callable, Optional, Dict, Tuple, Set
 from src.config import Settings
 from src.agent.lsp import LSPClient
 from src.agent.hooks import HookEvent
 
+# Seconds to wait for more writes to a file before notifying the server
+_SAVE_DEBOUNCE = 0.05
+
+_LANG_BY_EXT = {
+    ".py": "python",
+    ".rs": "rust",
+    ".js": "javascript",
+    ".jsx": "javascriptreact",
+    ".ts": "typescript",
+    ".tsx": "typescriptreact",
+    ".go": "go",
+    ".c": "c",
+    ".h": "c",
+    ".cpp": "cpp",
+    ".hpp": "cpp",
+    ".rb": "ruby",
+    ".java": "java",
+}
+
+def _read_text(path: str) -> str:
+    with open(path, "r") as f:
+        return f.read()
+
 class LSPManager:
     def __init__(self, settings: Settings):
         self.settings = settings
         self.client: Optional[LSPClient] = None
         self.tools: List[Any] = []
+        self._started = False
+        # path -> (mtime, version, content hash) of the text last sent to the server
+        self._open: Dict[str, Tuple[int, int, int]] = {}
+        self._save_timers: Dict[str, asyncio.TimerHandle] = {}
+        self._save_tasks: Set[asyncio.Task] = set()
+        # (path, line, character) -> (mtime, symbol info) from lsp_symbol_info; cleared
+        # whenever a file changes, since definitions and references span the project
+        self._symbol_cache: Dict[Tuple[str, int, int], Tuple[int, Dict[str, str]]] = {}
         
     def start(self):
         if not self.settings.lsp_enabled:
             return
 
-        try:
-            command = shlex.split(self.settings.lsp_command)
-            root_uri = f"file://{os.getcwd()}"
-            
-            self.client = LSPClient(command, root_uri)
-            self.client.initialize()
-            print(f"LSP Server started: {self.settings.lsp_command}")
-            
-            # Register tools
-            self.tools = [
-                self.lsp_hover,
-                self.lsp_definition,
-                self.lsp_references,
-                self.lsp_rename
-            ]
-            
-        except Exception as e:
-            print(f"Failed to start LSP server: {e}")
+        command = shlex.split(self.settings.lsp_command)
+        root_uri = f"file://{os.getcwd()}"
+        
+        # The server is spawned on the event loop by the first LSP call
+        self.client = LSPClient(command, root_uri)
+        self._started = False
+        self._start_lock = asyncio.Lock()
+        
+        # Register tools
+        self.tools = [
+            self.lsp_hover,
+            self.lsp_definition,
+            self.lsp_references,
+            self.lsp_symbol_info,
+            self.lsp_rename
+        ]
 
-    def stop(self):
-        if self.client:
-            self.client.stop()
+    async def _ensure_started(self) -> bool:
+        if not self.client:
+            return False
+        async with self._start_lock:
+            if not self._started:
+                try:
+                    await self.client.initialize()
+                    self._started = True
+                    print(f"LSP Server started: {self.settings.lsp_command}")
+                except Exception as e:
+                    print(f"Failed to start LSP server: {e}")
+                    await self.client.stop()
+                    self.client = None
+                    return False
+        return True
+
+    async def stop(self):
+        for timer in self._save_timers.values():
+            timer.cancel()
+        self._save_timers.clear()
+        if self.client and self._started:
+            await self.client.stop()
+            self._started = False
+
+    def _cached_symbol_info(self, file_path: str, line: int, character: int) -> Optional[Dict[str, str]]:
+        cached = self._symbol_cache.get((file_path, line, character))
+        if not cached:
+            return None
+        try:
+            mtime = os.stat(file_path).st_mtime_ns
+        except OSError:
+            mtime = 0
+        return cached[1] if cached[0] == mtime else None
 
-    def lsp_hover(self, file_path: str, line: int, character: int) -> str:
+    async def lsp_hover(self, file_path: str, line: int, character: int) -> str:
         """Get hover information for a symbol at the specified position."""
-        if not self.client: return "LSP not running."
-        # Ensure file is open
-        self._ensure_open(file_path)
-        return self.client.hover(file_path, line, character)
+        if not await self._ensure_started(): return "LSP not running."
+        await self._ensure_open(file_path)
+        info = self._cached_symbol_info(file_path, line, character)
+        return info["hover"] if info else await self.client.hover(file_path, line, character)
 
-    def lsp_definition(self, file_path: str, line: int, character: int) -> str:
+    async def lsp_definition(self, file_path: str, line: int, character: int) -> str:
         """Get definition location for a symbol."""
-        if not self.client: return "LSP not running."
-        self._ensure_open(file_path)
-        return self.client.definition(file_path, line, character)
+        if not await self._ensure_started(): return "LSP not running."
+        await self._ensure_open(file_path)
+        info = self._cached_symbol_info(file_path, line, character)
+        return info["definition"] if info else await self.client.definition(file_path, line, character)
 
-    def lsp_references(self, file_path: str, line: int, character: int) -> str:
+    async def lsp_references(self, file_path: str, line: int, character: int) -> str:
         """Find references to a symbol."""
-        if not self.client: return "LSP not running."
-        self._ensure_open(file_path)
-        return self.client.references(file_path, line, character)
+        if not await self._ensure_started(): return "LSP not running."
+        await self._ensure_open(file_path)
+        info = self._cached_symbol_info(file_path, line, character)
+        return info["references"] if info else await self.client.references(file_path, line, character)
 
-    def lsp_rename(self, file_path: str, line: int, character: int, new_name: str) -> str:
+    async def lsp_symbol_info(self, file_path: str, line: int, character: int) -> str:
+        """Get hover information, definition location and references for a symbol in one call."""
+        if not await self._ensure_started(): return "LSP not running."
+        await self._ensure_open(file_path)
+        info = self._cached_symbol_info(file_path, line, character)
+        if info is None:
+            try:
+                mtime = os.stat(file_path).st_mtime_ns
+            except OSError:
+                mtime = 0
+            info = await self.client.symbol_info(file_path, line, character)
+            if len(self._symbol_cache) >= 64:
+                self._symbol_cache.clear()
+            self._symbol_cache[(file_path, line, character)] = (mtime, info)
+        return (
+            f"Hover:\n{info['hover']}\n\n"
+            f"Definition:\n{info['definition']}\n\n"
+            f"References:\n{info['references']}"
+        )
+
+    async def lsp_rename(self, file_path: str, line: int, character: int, new_name: str) -> str:
         """Rename a symbol and return the edits (does not apply them)."""
-        if not self.client: return "LSP not running."
-        self._ensure_open(file_path)
-        return self.client.rename(file_path, line, character, new_name)
-
-    def _ensure_open(self, file_path: str):
-        # In a real impl, we track open files. For now, we just send didOpen every time 
-        # (inefficient but safe if server handles it, or we check if we sent it).
-        # Better: Read file content and send didOpen.
-        if not os.path.exists(file_path):
+        if not await self._ensure_started(): return "LSP not running."
+        await self._ensure_open(file_path)
+        return await self.client.rename(file_path, line, character, new_name)
+
+    async def _ensure_open(self, file_path: str):
+        # Only (re)send the document when it changed on disk since we last sent it
+        try:
+            mtime = os.stat(file_path).st_mtime_ns
+        except OSError:
             return
             
-        with open(file_path, "r") as f:
-            content = f.read()
-        
-        # Determine language ID
-        ext = os.path.splitext(file_path)[1]
-        lang_id = "python"
-        if ext == ".rs": lang_id = "rust"
-        elif ext == ".js": lang_id = "javascript"
-        elif ext == ".ts": lang_id = "typescript"
-        elif ext == ".go": lang_id = "go"
+        state = self._open.get(file_path)
+        if state and state[0] == mtime:
+            return
+            
+        # Off the event loop, which also carries the UI and the other servers' traffic
+        content = await asyncio.to_thread(_read_text, file_path)
+        digest = hash(content)
+        # A concurrent lookup may have sent it while this one was reading
+        state = self._open.get(file_path)
+        if state and state[0] == mtime:
+            return
         
-        self.client.did_open(file_path, content, lang_id)
+        if state is None:
+            # Determine language ID
+            lang_id = _LANG_BY_EXT.get(os.path.splitext(file_path)[1], "plaintext")
+            
+            await self.client.did_open(file_path, content, lang_id)
+            self._open[file_path] = (mtime, 1, digest)
+        elif state[2] == digest:
+            # Touched but unchanged, no need to make the server re-parse it
+            self._open[file_path] = (mtime, state[1], digest)
+        else:
+            version = state[1] + 1
+            self._symbol_cache.clear()
+            await self.client.did_change(file_path, content, version)
+            self._open[file_path] = (mtime, version, digest)
 
     async def on_post_tool_use(self, event_data: dict):
         """Hook to handle file changes."""
-        if not self.client: return
+        # Nothing to notify until the server has been started
+        if not self.client or not self._started: return
         
         tool_name = event_data.get("tool_name")
         if tool_name == "write_file":
@@ -94,6 +191,29 @@ class LSPManager:
             
             # write_file(path, content)
             path = kwargs.get("path") or (args[0] if len(args) > 0 else None)
+            # Any write can move definitions or add references elsewhere
+            self._symbol_cache.clear()
             
-            if path:
-                self.client.did_save(path)
+            # Files the server never opened are picked up on their first lookup
+            if path and path in self._open:
+                # Bursts of writes to one file collapse into a single didChange/didSave
+                timer = self._save_timers.pop(path, None)
+                if timer:
+                    timer.cancel()
+                loop = asyncio.get_running_loop()
+                self._save_timers[path] = loop.call_later(_SAVE_DEBOUNCE, self._schedule_save, path)
+
+    def _schedule_save(self, path: str):
+        self._save_timers.pop(path, None)
+        task = asyncio.create_task(self._sync_and_save(path))
+        self._save_tasks.add(task)
+        task.add_done_callback(self._save_tasks.discard)
+
+    async def _sync_and_save(self, path: str):
+        if not self.client:
+            return
+        try:
+            await self._ensure_open(path)
+            await self.client.did_save(path)
+        except Exception as e:
+            print(f"LSP didSave failed for {path}: {e}")
@@ -2,6 +2,7 @@ import os
 import json
 import asyncio
 from typing import Dict, Any, List, Optional
+from contextlib import AsyncExitStack
 from pydantic import BaseModel
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
@@ -12,13 +13,26 @@ class MCPServerConfig(BaseModel):
     args: List[str] = []
     env: Dict[str, str] = {}
 
+def _format_content(contents: List[Any]) -> str:
+    """Format mixed MCP tool result content as text."""
+    output = []
+    for content in contents:
+        if content.type == "text":
+            output.append(content.text)
+        elif content.type == "image":
+            output.append(f"[Image: {content.mimeType}]")
+        elif content.type == "resource":
+            output.append(f"[Resource: {content.uri}]")
+    return "\n".join(output)
+
 class MCPManager:
     def __init__(self, settings: Settings):
         self.settings = settings
         self.servers: Dict[str, MCPServerConfig] = {}
         self.sessions: Dict[str, ClientSession] = {}
         self.tools: List[Any] = []
-        self._exit_stack = None
+        self._closing: Optional[asyncio.Event] = None
+        self._server_tasks: List[asyncio.Task] = []
 
     def load_config(self):
         """Load MCP configuration from .mcp.json or .agent-coder/mcp.json."""
@@ -48,11 +62,32 @@ class MCPManager:
 
     async def connect_all(self):
         """Connect to all configured MCP servers."""
-        from contextlib import AsyncExitStack
-        self._exit_stack = AsyncExitStack()
+        # Each server's contexts are entered and exited by its own task, so
+        # the handshakes run concurrently and anyio's task-bound cancel scopes stay happy
+        self._closing = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        ready = {name: loop.create_future() for name in self.servers}
+        self._server_tasks = [
+            asyncio.create_task(self._serve(name, config, ready[name]))
+            for name, config in self.servers.items()
+        ]
         
-        for name, config in self.servers.items():
-            try:
+        results = await asyncio.gather(*ready.values(), return_exceptions=True)
+        for name, result in zip(ready, results):
+            if isinstance(result, BaseException):
+                print(f"Failed to connect to MCP server {name}: {result}")
+                continue
+                
+            session, tools = result
+            self.sessions[name] = session
+            for tool in tools:
+                # Wrap the tool for the agent
+                await self._register_tool(name, session, tool)
+
+    async def _serve(self, name: str, config: MCPServerConfig, ready: asyncio.Future):
+        """Connect to one MCP server and keep the connection open until cleanup."""
+        try:
+            async with AsyncExitStack() as stack:
                 # Merge env with current environment
                 env = os.environ.copy()
                 env.update(config.env)
@@ -64,44 +99,48 @@ class MCPManager:
                 )
                 
                 # Start the stdio client
-                read, write = await self._exit_stack.enter_async_context(
+                read, write = await stack.enter_async_context(
                     stdio_client(server_params)
                 )
                 
                 # Create the session
-                session = await self._exit_stack.enter_async_context(
+                session = await stack.enter_async_context(
                     ClientSession(read, write)
                 )
                 
                 await session.initialize()
-                self.sessions[name] = session
                 
                 # List tools
                 result = await session.list_tools()
-                for tool in result.tools:
-                    # Wrap the tool for the agent
-                    await self._register_tool(name, session, tool)
-                    
-            except Exception as e:
-                print(f"Failed to connect to MCP server {name}: {e}")
+                ready.set_result((session, result.tools))
+                
+                await self._closing.wait()
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+            else:
+                print(f"MCP server {name} disconnected: {e}")
+        finally:
+            if not ready.done():
+                ready.cancel()
 
     async def _register_tool(self, server_name: str, session: ClientSession, tool_info: Any):
         """Register an MCP tool as a callable for the agent."""
         
+        # Most tools only ever return text, so assume that until one doesn't
+        text_only = True
+        
         async def mcp_tool_wrapper(**kwargs):
             """Dynamic wrapper for MCP tool."""
+            nonlocal text_only
             try:
                 result = await session.call_tool(tool_info.name, arguments=kwargs)
-                # Format result
-                output = []
-                for content in result.content:
-                    if content.type == "text":
-                        output.append(content.text)
-                    elif content.type == "image":
-                        output.append(f"[Image: {content.mimeType}]")
-                    elif content.type == "resource":
-                        output.append(f"[Resource: {content.uri}]")
-                return "\n".join(output)
+                if text_only:
+                    try:
+                        return "\n".join([content.text for content in result.content])
+                    except AttributeError:
+                        text_only = False
+                return _format_content(result.content)
             except Exception as e:
                 return f"Error calling tool {tool_info.name}: {str(e)}"
 
@@ -112,7 +151,18 @@ class MCPManager:
         
         self.tools.append(mcp_tool_wrapper)
 
+    async def reload(self):
+        """Close every connection, re-read the config and connect again."""
+        await self.cleanup()
+        self.servers.clear()
+        self.sessions.clear()
+        self.tools.clear()
+        self.load_config()
+        await self.connect_all()
+
     async def cleanup(self):
         """Close all connections."""
-        if self._exit_stack:
-            await self._exit_stack.aclose()
+        if self._closing:
+            self._closing.set()
+            await asyncio.gather(*self._server_tasks, return_exceptions=True)
+            self._server_tasks = []
@@ -1,8 +1,14 @@
 import os
 import yaml
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from pydantic import BaseModel
 from src.config import Settings
+from src.agent.filecache import mtime_cached
+
+try:
+    from yaml import CSafeLoader as _Loader
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeLoader as _Loader
 
 class SkillConfig(BaseModel):
     name: str
@@ -10,6 +16,38 @@ class SkillConfig(BaseModel):
     allowed_tools: Optional[List[str]] = None
     content: str
 
+# file path -> (mtime, parsed skill or None if it has no frontmatter)
+_skill_cache: Dict[str, Tuple[int, Optional[SkillConfig]]] = {}
+
+def _parse_skill(file_path: str, root: str, filename: str) -> Optional[SkillConfig]:
+    skill = None
+    with open(file_path, "rb") as f:
+        # Files without frontmatter are skipped after reading three bytes
+        head = f.read(3)
+        if head == b"---":
+            content = (head + f.read()).decode("utf-8")
+            parts = content.split("---", 2)
+            if len(parts) >= 3:
+                yaml_content = parts[1]
+                body = parts[2].strip()
+                
+                config_data = yaml.load(yaml_content, Loader=_Loader)
+                # If name is not in frontmatter, infer from filename or directory
+                if "name" not in config_data:
+                    if filename == "SKILL.md":
+                        config_data["name"] = os.path.basename(root)
+                    else:
+                        config_data["name"] = os.path.splitext(filename)[0]
+                
+                config_data["content"] = body
+                skill = SkillConfig(**config_data)
+                
+    return skill
+
+def _load_skill(file_path: str, root: str, filename: str, mtime: int) -> Optional[SkillConfig]:
+    """Parse one skill file, reusing the previous result if it hasn't changed."""
+    return mtime_cached(_skill_cache, file_path, lambda path: _parse_skill(path, root, filename), mtime)
+
 def load_skills(settings: Settings) -> Dict[str, SkillConfig]:
     """Load skills from .claude/skills directory."""
     skills = {}
@@ -26,31 +64,19 @@ def load_skills(settings: Settings) -> Dict[str, SkillConfig]:
             
         # Walk through the directory to find SKILL.md files
         # Skills can be single files or directories containing SKILL.md
-        for root, dirs, files in os.walk(skills_dir):
-            for filename in files:
-                if filename == "SKILL.md" or (root == skills_dir and filename.endswith(".md")):
-                    file_path = os.path.join(root, filename)
-                    try:
-                        with open(file_path, "r") as f:
-                            content = f.read()
-                            if content.startswith("---"):
-                                parts = content.split("---", 2)
-                                if len(parts) >= 3:
-                                    yaml_content = parts[1]
-                                    body = parts[2].strip()
-                                    
-                                    config_data = yaml.safe_load(yaml_content)
-                                    # If name is not in frontmatter, infer from filename or directory
-                                    if "name" not in config_data:
-                                        if filename == "SKILL.md":
-                                            config_data["name"] = os.path.basename(root)
-                                        else:
-                                            config_data["name"] = os.path.splitext(filename)[0]
-                                    
-                                    config_data["content"] = body
-                                    skill = SkillConfig(**config_data)
-                                    skills[skill.name] = skill
-                    except Exception as e:
-                        print(f"Error loading skill {file_path}: {e}")
+        stack = [skills_dir]
+        while stack:
+            root = stack.pop()
+            with os.scandir(root) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.name == "SKILL.md" or (root == skills_dir and entry.name.endswith(".md")):
+                        try:
+                            skill = _load_skill(entry.path, root, entry.name, entry.stat().st_mtime_ns)
+                            if skill:
+                                skills[skill.name] = skill
+                        except Exception as e:
+                            print(f"Error loading skill {entry.path}: {e}")
                 
     return skills
@@ -2,6 +2,19 @@ import os
 import shutil
 import re
 
+_NAME_RE = re.compile(rb"^name:", re.MULTILINE)
+_TEMPLATES_SPECIFY = b".specify/templates"
+_TEMPLATES_AGENT_CODER = b".agent-coder/speckit/templates"
+_AGENT_SCRIPT = b".agent-coder/speckit/scripts/update-agent-context.sh"
+
+def _is_stale(src: str, dst: str, since: int = 0) -> bool:
+    """Whether dst is missing or older than src (or than the `since` mtime)."""
+    try:
+        dst_mtime = os.stat(dst).st_mtime_ns
+    except OSError:
+        return True
+    return dst_mtime < max(os.stat(src).st_mtime_ns, since)
+
 def install_speckit(project_root: str):
     """Install SpecKit resources to the project."""
     
@@ -19,34 +32,46 @@ def install_speckit(project_root: str):
     
     # Copy resources
     if os.path.exists(resources_dir):
-        # Copy everything first
-        if os.path.exists(speckit_dir):
-            shutil.rmtree(speckit_dir)
-        shutil.copytree(resources_dir, speckit_dir)
+        # Patched outputs are also redone when this installer changes
+        installer_mtime = os.stat(__file__).st_mtime_ns
+        src_scripts_dir = os.path.join(resources_dir, "scripts")
         
-        # Patch scripts
-        scripts_dir = os.path.join(speckit_dir, "scripts")
-        for filename in os.listdir(scripts_dir):
-            if filename.endswith(".sh"):
-                filepath = os.path.join(scripts_dir, filename)
-                with open(filepath, "r") as f:
-                    content = f.read()
-                
-                # Patch template path: .specify/templates -> .agent-coder/speckit/templates
-                content = content.replace(".specify/templates", ".agent-coder/speckit/templates")
+        # Copy only what is missing or older than its source
+        for root, dirs, files in os.walk(resources_dir):
+            target_dir = os.path.join(speckit_dir, os.path.relpath(root, resources_dir))
+            os.makedirs(target_dir, exist_ok=True)
+            for filename in files:
+                src_path = os.path.join(root, filename)
+                filepath = os.path.join(target_dir, filename)
                 
-                with open(filepath, "w") as f:
-                    f.write(content)
-                
-                # Make executable
-                os.chmod(filepath, 0o755)
+                if root == src_scripts_dir and filename.endswith(".sh"):
+                    # Patch scripts
+                    if not _is_stale(src_path, filepath, installer_mtime):
+                        continue
+                    with open(src_path, "rb") as f:
+                        content = f.read()
+                    
+                    # Patch template path: .specify/templates -> .agent-coder/speckit/templates
+                    content = content.replace(_TEMPLATES_SPECIFY, _TEMPLATES_AGENT_CODER)
+                    
+                    with open(filepath, "wb") as f:
+                        f.write(content)
+                    
+                    # Make executable
+                    os.chmod(filepath, 0o755)
+                elif _is_stale(src_path, filepath):
+                    shutil.copy2(src_path, filepath)
 
         # Patch commands and install as skills
-        commands_dir = os.path.join(speckit_dir, "commands")
+        commands_dir = os.path.join(resources_dir, "commands")
         for filename in os.listdir(commands_dir):
             if filename.endswith(".md"):
                 filepath = os.path.join(commands_dir, filename)
-                with open(filepath, "r") as f:
+                skill_path = os.path.join(skills_dir, f"speckit-{filename}")
+                if not _is_stale(filepath, skill_path, installer_mtime):
+                    continue
+                    
+                with open(filepath, "rb") as f:
                     content = f.read()
                 
                 # Determine script names based on filename
@@ -69,13 +94,12 @@ def install_speckit(project_root: str):
                 # We'll replace {SCRIPT} with the full command.
                 
                 # Check if script exists
-                if os.path.exists(os.path.join(scripts_dir, script_name)):
+                if os.path.exists(os.path.join(src_scripts_dir, script_name)):
                     full_command = f"{script_path} --json"
-                    content = content.replace("{SCRIPT}", full_command)
+                    content = content.replace(b"{SCRIPT}", full_command.encode())
                 
                 # Replace {AGENT_SCRIPT}
-                agent_script_path = ".agent-coder/speckit/scripts/update-agent-context.sh"
-                content = content.replace("{AGENT_SCRIPT}", agent_script_path)
+                content = content.replace(b"{AGENT_SCRIPT}", _AGENT_SCRIPT)
                 
                 # Update header to be a valid skill
                 # SpecKit headers are:
@@ -87,12 +111,11 @@ def install_speckit(project_root: str):
                 # Our loader handles filename as name.
                 # But let's add 'name: speckit-<cmd>' to be explicit.
                 
-                if not re.search(r"^name:", content, re.MULTILINE):
-                    content = content.replace("---", f"---\nname: speckit-{base_name}", 1)
+                if not _NAME_RE.search(content):
+                    content = content.replace(b"---", f"---\nname: speckit-{base_name}".encode(), 1)
                 
                 # Write to skills dir
-                skill_path = os.path.join(skills_dir, f"speckit-{filename}")
-                with open(skill_path, "w") as f:
+                with open(skill_path, "wb") as f:
                     f.write(content)
 
     return True
@@ -1,8 +1,14 @@
 import os
 import yaml
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from pydantic import BaseModel
 from src.config import Settings
+from src.agent.filecache import mtime_cached
+
+try:
+    from yaml import CSafeLoader as _Loader
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeLoader as _Loader
 
 class SubAgentConfig(BaseModel):
     name: str
@@ -12,6 +18,49 @@ class SubAgentConfig(BaseModel):
     model: Optional[str] = None
     permission_mode: str = "default"
 
+_MARKDOWN_EXTS = (".md", ".markdown")
+_YAML_EXTS = (".yaml", ".yml")
+_SUBAGENT_EXTS = _MARKDOWN_EXTS + _YAML_EXTS
+
+# file path -> (mtime, parsed subagent or None if it has no frontmatter)
+_subagent_cache: Dict[str, Tuple[int, Optional[SubAgentConfig]]] = {}
+
+def _parse_subagent(file_path: str) -> Optional[SubAgentConfig]:
+    agent_config = None
+    with open(file_path, "rb") as f:
+        if file_path.endswith(_YAML_EXTS):
+            # Plain YAML definition with the system prompt under "prompt"
+            config_data = yaml.load(f, Loader=_Loader)
+            if config_data:
+                agent_config = SubAgentConfig(**config_data)
+        else:
+            # Parse frontmatter-like YAML
+            # The format described is:
+            # ---
+            # name: ...
+            # ---
+            # System prompt
+            
+            # Files without frontmatter are skipped after reading three bytes
+            head = f.read(3)
+            if head == b"---":
+                content = (head + f.read()).decode("utf-8")
+                parts = content.split("---", 2)
+                if len(parts) >= 3:
+                    yaml_content = parts[1]
+                    system_prompt = parts[2].strip()
+                    
+                    config_data = yaml.load(yaml_content, Loader=_Loader)
+                    config_data["prompt"] = system_prompt
+                    
+                    agent_config = SubAgentConfig(**config_data)
+                
+    return agent_config
+
+def _load_subagent(file_path: str, mtime: int) -> Optional[SubAgentConfig]:
+    """Parse one subagent file, reusing the previous result if it hasn't changed."""
+    return mtime_cached(_subagent_cache, file_path, _parse_subagent, mtime)
+
 def load_subagents(settings: Settings) -> Dict[str, SubAgentConfig]:
     """Load subagents from .claude/agents directory."""
     agents = {}
@@ -26,30 +75,14 @@ def load_subagents(settings: Settings) -> Dict[str, SubAgentConfig]:
         if not os.path.exists(agents_dir):
             continue
             
-        for filename in os.listdir(agents_dir):
-            if filename.endswith(".md") or filename.endswith(".markdown"):
-                try:
-                    with open(os.path.join(agents_dir, filename), "r") as f:
-                        # Parse frontmatter-like YAML
-                        # The format described is:
-                        # ---
-                        # name: ...
-                        # ---
-                        # System prompt
-                        
-                        content = f.read()
-                        if content.startswith("---"):
-                            parts = content.split("---", 2)
-                            if len(parts) >= 3:
-                                yaml_content = parts[1]
-                                system_prompt = parts[2].strip()
-                                
-                                config_data = yaml.safe_load(yaml_content)
-                                config_data["prompt"] = system_prompt
-                                
-                                agent_config = SubAgentConfig(**config_data)
-                                agents[agent_config.name] = agent_config
-                except Exception as e:
-                    print(f"Error loading subagent {filename}: {e}")
+        with os.scandir(agents_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(_SUBAGENT_EXTS) and entry.is_file():
+                    try:
+                        agent_config = _load_subagent(entry.path, entry.stat().st_mtime_ns)
+                        if agent_config:
+                            agents[agent_config.name] = agent_config
+                    except Exception as e:
+                        print(f"Error loading subagent {entry.name}: {e}")
                 
     return agents
@@ -27,6 +27,7 @@ class Settings(BaseSettings):
     # Context & Performance
     max_context_size: int = Field(default=8192, description="Maximum context size for the model")
     temperature: float = Field(default=0.7, description="Model temperature")
+    subagent_max_batch: int = Field(default=8, description="Maximum queries combined into one subagent run by delegate_to_*_batch")
 
     # Permissions & Security
     # Simple list of tools that are always allowed without confirmation (in Auto mode)
@@ -35,6 +36,7 @@ class Settings(BaseSettings):
     
     # Logging
     log_level: str = Field(default="INFO", description="Logging level")
+    log_max_lines: int = Field(default=5000, description="Maximum number of lines kept in the TUI chat log")
 
     def save_to_json(self, path: str = "settings.json"):
         """Save current settings to a JSON file."""
@@ -1,3 +1,8 @@
+import os
+import time
+import asyncio
+import functools
+from typing import Dict, List, Optional, Tuple
 from textual.app import App, ComposeResult
 from textual import work
 from textual.widgets import Header, Footer, Input, RichLog, Label, Button, TextArea, Select
@@ -6,7 +11,135 @@ from textual.screen import ModalScreen
 from textual import events
 from textual.message import Message
 from src.tui.settings_screen import SettingsScreen
-from pydantic_ai.messages import ModelRequest, ModelResponse, TextPart, UserPromptPart
+from pydantic_ai.messages import ModelRequest, ModelResponse, TextPart, ToolCallPart, UserPromptPart
+from rich.text import Text
+import aiohttp
+from src.config import Settings
+from src.models import AgentMode
+from src.agent.core import create_agent, stream_agent_response
+from src.agent.hooks import HookEvent
+from src.agent.filecache import mtime_cached, read_text_cached
+from src.agent.mcp_manager import MCPManager
+from src.agent.speckit import install_speckit
+
+_HELP_TEXT = Text.from_markup("""
+        [bold]Available Commands:[/bold]
+        /help       - Show this help message
+        /clear      - Clear the chat log
+        /compact    - Compact conversation history
+        /exit       - Exit the application
+        /settings   - Open settings dialog (or press 's')
+        /model      - Show or set current model
+        /provider   - Show or set current provider
+        /mode       - Show or set current mode
+        /memory     - Manage project memory
+        /doctor     - Check system health
+        /statusline - Configure status line
+        /speckit    - Run SpecKit commands
+        /mcp        - List MCP servers ('/mcp reload' to reconnect)
+        """)
+
+# Seconds between chat log writes of a reply that is streaming in (~30 fps)
+_LOG_FLUSH = 1 / 30
+
+# Seconds a healthy /doctor probe result is reused
+_DOCTOR_TTL = 5.0
+
+# Status bar messages, built once so updates skip markup parsing
+_STATUS_CLEAR = Text("")
+_STATUS_CONNECTING = Text("Connecting to MCP servers...")
+_STATUS_INITIALIZING = Text("Initializing agent...")
+_STATUS_READY = Text("Ready.")
+_STATUS_THINKING = Text("Thinking...")
+_STATUS_COMPACTING = Text("Compacting history...")
+
+_USER_PREFIX = Text.from_markup("[bold blue]You:[/bold blue] ")
+_AGENT_PREFIX = Text.from_markup("[bold green]Agent:[/bold green] ")
+_CLEAR_BANNER = Text.from_markup("[bold yellow]Chat cleared.[/bold yellow]")
+_ERR_PREFIX = Text.from_markup("[bold red]Error:[/bold red] ")
+
+_VALID_PROVIDERS = frozenset({"ollama", "anthropic", "claude", "google", "gemini", "openai", "gpt"})
+
+# API key each hosted provider needs, checked by /doctor
+_PROVIDER_ENV = {
+    "anthropic": "ANTHROPIC_API_KEY",
+    "claude": "ANTHROPIC_API_KEY",
+    "google": "GEMINI_API_KEY",
+    "gemini": "GEMINI_API_KEY",
+    "openai": "OPENAI_API_KEY",
+    "gpt": "OPENAI_API_KEY",
+}
+
+# Memoized so each distinct mode string goes through the enum constructor once
+@functools.lru_cache(maxsize=8)
+def _to_mode(mode: str) -> AgentMode:
+    """Return the AgentMode for a mode string (raises ValueError for unknown modes)."""
+    return AgentMode(mode)
+
+_MEMORY_PATH = "AGENT_MEMORY.md"
+
+# Seconds between flushes of buffered /memory additions, and how many may queue before writing through
+_MEMORY_FLUSH = 0.5
+_MEMORY_BUF_MAX = 32
+
+# Bytes of the memory file /memory shows unless asked for the full file
+_MEMORY_TAIL_BYTES = 8192
+
+def _read_memory(path: str) -> Optional[str]:
+    """Return the memory file's contents (None if missing), re-reading only when it changes."""
+    try:
+        return read_text_cached(path)
+    except FileNotFoundError:
+        return None
+
+def _read_memory_tail(path: str, limit: int = _MEMORY_TAIL_BYTES) -> Optional[Tuple[str, bool]]:
+    """Return the end of the memory file and whether it was cut short (None if missing)."""
+    try:
+        size = os.stat(path).st_size
+    except FileNotFoundError:
+        return None
+    if size <= limit:
+        content = _read_memory(path)
+        return None if content is None else (content, False)
+    with open(path, "rb") as f:
+        f.seek(size - limit)
+        tail = f.read()
+    # Start at the first whole line
+    tail = tail[tail.find(b"\n") + 1:]
+    return tail.decode("utf-8", "replace"), True
+
+def _append_memory(path: str, items: List[str]) -> None:
+    with open(path, "a") as f:
+        f.write("".join(f"\n- {item}" for item in items))
+
+# SpecKit skill prompts (frontmatter stripped) by path, with the mtime they were read at
+_skill_prompt_cache: Dict[str, Tuple[int, str]] = {}
+
+def _load_skill_prompt(path: str) -> str:
+    with open(path, "r") as f:
+        content = f.read()
+    # Strip frontmatter: find the closing "---" without splitting the whole body
+    if content.startswith("---"):
+        end = content.find("---", 3)
+        if end >= 0:
+            content = content[end + 3:].strip()
+    return content
+
+def _read_skill_prompt(path: str) -> Optional[str]:
+    """Return a skill file's body without its frontmatter (None if missing), re-reading only when it changes."""
+    try:
+        return mtime_cached(_skill_prompt_cache, path, _load_skill_prompt)
+    except FileNotFoundError:
+        return None
+
+def install_uvloop() -> None:
+    """Use uvloop for the app's event loop when it is available."""
+    try:
+        import uvloop
+    except ImportError:
+        return
+    # App.run() goes through asyncio.run(), which picks up the policy
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
 
 class ChatInput(TextArea):
     """Custom TextArea for chat input."""
@@ -22,21 +155,30 @@ class ChatInput(TextArea):
         self.show_line_numbers = False
 
     async def _on_key(self, event: events.Key) -> None:
-        if event.key == "enter" and not event.shift and not event.ctrl and not event.alt:
+        # A bare Enter submits and stops here (modified presses arrive as "shift+enter" etc.)
+        if event.key == "enter":
             event.stop()
+            event.prevent_default()
             value = self.text.strip()
             if value:
                 self.post_message(self.Submitted(value))
                 self.clear()
+            return
         return await super()._on_key(event)
 
 class ConfirmationScreen(ModalScreen[bool]):
     """Screen for confirming actions."""
 
-    def __init__(self, message: str):
+    def __init__(self, message: str = ""):
         super().__init__()
         self.message = message
 
+    def set_message(self, message: str) -> None:
+        """Change the question shown, so one instance can be reused."""
+        self.message = message
+        if self.is_mounted:
+            self.query_one("#question", Label).update(message)
+
     def compose(self) -> ComposeResult:
         yield Grid(
             Label(self.message, id="question"),
@@ -54,60 +196,7 @@ class ConfirmationScreen(ModalScreen[bool]):
 class AgentCoderApp(App):
     """A Textual app for the Agent Coder."""
 
-    CSS = """
-    Screen {
-        layout: vertical;
-    }
-    RichLog {
-        height: 1fr;
-        border: solid green;
-    }
-    ChatInput {
-        dock: bottom;
-        height: 3;
-        border: solid gray;
-    }
-    
-    ConfirmationScreen {
-        align: center middle;
-    }
-    #dialog {
-        grid-size: 2;
-        grid-gutter: 1 2;
-        grid-rows: 1fr 3;
-        padding: 0 1;
-        width: 60;
-        height: 11;
-        border: thick $background 80%;
-        background: $surface;
-    }
-    #question {
-        column-span: 2;
-        height: 1fr;
-        width: 1fr;
-        content-align: center middle;
-    }
-    Button {
-        width: 100%;
-    }
-    SettingsScreen {
-        align: center middle;
-    }
-    #settings_dialog {
-        grid-size: 2;
-        grid-gutter: 1 2;
-        grid-rows: 1fr 1fr 1fr 1fr;
-        padding: 1 2;
-        width: 60;
-        height: 25;
-        border: thick $background 80%;
-        background: $surface;
-    }
-    .label {
-        content-align: left middle;
-        height: 100%;
-    }
-    """
+    CSS_PATH = "app.tcss"
 
     BINDINGS = [
         ("d", "toggle_dark", "Toggle dark mode"),
@@ -120,7 +209,7 @@ class AgentCoderApp(App):
     def compose(self) -> ComposeResult:
         yield Header()
         yield Vertical(
-            RichLog(id="chat_log", highlight=True, markup=True),
+            RichLog(id="chat_log", highlight=True, markup=True, auto_scroll=True),
             Label("", id="status_bar"),
             ChatInput(id="chat_input"),
         )
@@ -136,28 +225,113 @@ class AgentCoderApp(App):
         self.lsp_command = lsp_command
         self.agent = None
         self.message_history = []
+        self._http: Optional[aiohttp.ClientSession] = None
+        self._mcp_connect: Optional[asyncio.Task] = None
+        self._chat_log: Optional[RichLog] = None
+        self._status_bar: Optional[Label] = None
+        self._status_text: Text = _STATUS_CLEAR
+        self._log_buffer: List[str] = []
+        self._log_timer = None
+        self._reply_started = False
+        self._confirm_screen: Optional[ConfirmationScreen] = None
+        self._confirm_lock = asyncio.Lock()
+        self._doctor_cache: Optional[Tuple[float, str]] = None
+        # Whether each provider API key is set, looked up once per session
+        self._env_present: Dict[str, bool] = {}
+        # (provider, model, mode, prompt), the history it left and the reply, for the
+        # last exchange; only an identical resubmit of it right away is answered again
+        self._last_reply: Optional[Tuple[Tuple[str, str, str, str], List, str]] = None
+        self._memory_buf: List[str] = []
+        self._memory_lock = asyncio.Lock()
+        self._commands = {
+            "/help": self._cmd_help,
+            "/settings": self._cmd_settings,
+            "/clear": self._cmd_clear,
+            "/compact": self._cmd_compact,
+            "/exit": self._cmd_exit,
+            "/quit": self._cmd_exit,
+            "/model": self._cmd_model,
+            "/provider": self._cmd_provider,
+            "/mode": self._cmd_mode,
+            "/doctor": self._cmd_doctor,
+            "/memory": self._cmd_memory,
+            "/statusline": self._cmd_statusline,
+            "/speckit": self._cmd_speckit,
+            "/lsp": self._cmd_lsp,
+            "/mcp": self._cmd_mcp,
+        }
+
+    def _set_status(self, text: Text) -> None:
+        """Update the status bar, skipping the re-render when nothing changed."""
+        if text is not self._status_text:
+            self._status_text = text
+            self._status_bar.update(text)
+
+    def _write_reply(self, text: str) -> None:
+        """Write agent reply text, prefixing the first write of each reply."""
+        # Plain Text skips markup parsing and highlighting of the (untrusted) reply
+        self._chat_log.write(Text(text) if self._reply_started else _AGENT_PREFIX + Text(text))
+        self._reply_started = True
+
+    def _flush_log(self, final: bool = False) -> None:
+        """Write buffered reply text to the chat log.
+
+        RichLog can't extend a line, so until the reply is complete only
+        whole lines are written and the trailing partial line stays buffered.
+        """
+        text = "".join(self._log_buffer)
+        if not final:
+            head, sep, tail = text.rpartition("\n")
+            if not sep:
+                self._log_buffer = [text] if text else []
+                return
+            text = head
+            self._log_buffer = [tail] if tail else []
+        else:
+            self._log_buffer = []
+            if not text and self._reply_started:
+                return
+        self._write_reply(text)
+
+    def _http_session(self) -> aiohttp.ClientSession:
+        """Return the app's HTTP session, creating it on first use."""
+        if self._http is None:
+            # One session for the app's lifetime, reused by /doctor. Bounded pools keep a burst of
+            # probes from opening unbounded sockets, and cached DNS avoids a resolver call per request.
+            self._http = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=64, limit_per_host=16, ttl_dns_cache=300, enable_cleanup_closed=True
+                ),
+                timeout=aiohttp.ClientTimeout(total=5, connect=1),
+            )
+        return self._http
+
+    def _log_many(self, lines: list) -> None:
+        """Write several lines to the chat log in a single update."""
+        self._chat_log.write("\n".join(lines))
 
     async def confirm_action(self, message: str) -> bool:
         """Request confirmation from user."""
-        return await self.push_screen(ConfirmationScreen(message))
+        # One installed screen is reused, and confirmations are asked one at a time
+        async with self._confirm_lock:
+            if self._confirm_screen is None:
+                self._confirm_screen = ConfirmationScreen()
+                self.install_screen(self._confirm_screen, name="confirm")
+            self._confirm_screen.set_message(message)
+            return await self.push_screen("confirm", wait_for_dismiss=True)
 
     def on_mount(self) -> None:
         """Initialize the agent on mount."""
-        from src.agent.core import create_agent
-        from src.models import AgentMode
-        from src.config import Settings
-        
+        # Looked up once; every handler writes through these
+        self._chat_log = self.query_one("#chat_log", RichLog)
+        self._status_bar = self.query_one("#status_bar", Label)
+
         # Initialize settings with CLI overrides
-        settings = Settings(
-            model=self.model_name,
-            model_provider=self.model_provider,
-            mode=AgentMode(self.mode),
-            lsp_enabled=self.lsp_enabled,
-            lsp_command=self.lsp_command
-        )
+        settings = self._settings()
+        # Bound the scrollback so long sessions don't slow the log down
+        self._chat_log.max_lines = settings.log_max_lines
         
         # Initialize MCP Manager
-        from src.agent.mcp_manager import MCPManager
         self.mcp_manager = MCPManager(settings)
         self.mcp_manager.load_config()
         
@@ -169,18 +343,34 @@ class AgentCoderApp(App):
         # However, create_agent is synchronous in our current design.
         # We'll connect first, then create agent.
         
-        self.run_worker(self.initialize_agent(settings))
+        self._restart_agent(settings)
+        self.set_interval(_MEMORY_FLUSH, self._flush_memory)
+        # Only runs while a reply is streaming
+        self._log_timer = self.set_interval(_LOG_FLUSH, self._flush_log, pause=True)
 
     async def initialize_agent(self, settings):
         """Initialize agent with MCP tools."""
-        status = self.query_one("#status_bar", Label)
-        status.update("Connecting to MCP servers...")
+        # Settings changes don't affect the MCP servers, so they are connected only once.
+        # Shielded: a superseded init is cancelled, but the connection attempt carries on.
+        if self._mcp_connect is None:
+            self._mcp_connect = asyncio.create_task(self.mcp_manager.connect_all())
+        if not self._mcp_connect.done():
+            self._set_status(_STATUS_CONNECTING)
+            await asyncio.shield(self._mcp_connect)
+        
+        self._set_status(_STATUS_INITIALIZING)
         
-        await self.mcp_manager.connect_all()
+        # The new agent's prompt is built from the memory file, so buffered /memory
+        # additions must be on disk first; the old agent's copy of them is dropped
+        await self._flush_memory()
         
-        status.update("Initializing agent...")
-        from src.agent.core import create_agent
-        from src.agent.hooks import HookEvent
+        # Stop the old agent's streaming hook workers and language server before they
+        # are orphaned. Not SESSION_END: that also closes the shared HTTP client
+        if self.agent is not None:
+            if hasattr(self.agent, 'hook_manager'):
+                await self.agent.hook_manager.aclose()
+            if hasattr(self.agent, 'lsp_manager'):
+                await self.agent.lsp_manager.stop()
         
         self.agent = create_agent(
             settings=settings,
@@ -191,31 +381,54 @@ class AgentCoderApp(App):
         if hasattr(self.agent, 'hook_manager'):
             await self.agent.hook_manager.trigger(HookEvent.SESSION_START, {"session_id": "tui_session"})
         
-        status.update("Ready.")
+        self._set_status(_STATUS_READY)
         
-        if self.initial_query:
-            self.query_one("#chat_log", RichLog).write(f"[bold blue]You:[/bold blue] {self.initial_query}")
-            status.update("Thinking...")
-            self.get_response(self.initial_query)
+        # Sent once; later re-inits after settings changes must not repeat it
+        query, self.initial_query = self.initial_query, None
+        if query:
+            self._chat_log.write(_USER_PREFIX + Text(query))
+            self._set_status(_STATUS_THINKING)
+            self.get_response(query)
+
+    async def _flush_memory(self) -> None:
+        """Append buffered /memory additions to the memory file in one write."""
+        async with self._memory_lock:
+            if not self._memory_buf:
+                return
+            items, self._memory_buf = self._memory_buf, []
+            try:
+                await asyncio.to_thread(_append_memory, _MEMORY_PATH, items)
+            except Exception as e:
+                self._chat_log.write(Text(f"Error writing memory: {e}", style="bold red"))
 
     async def on_unmount(self) -> None:
         """Cleanup resources."""
-        from src.agent.hooks import HookEvent
+        if self._memory_buf:
+            try:
+                _append_memory(_MEMORY_PATH, self._memory_buf)
+                self._memory_buf = []
+            except Exception as e:
+                print(f"Error writing memory: {e}")
+
         if self.agent and hasattr(self.agent, 'hook_manager'):
             await self.agent.hook_manager.trigger(HookEvent.SESSION_END, {"session_id": "tui_session"})
 
         if hasattr(self, 'mcp_manager'):
             await self.mcp_manager.cleanup()
 
+        if self._http:
+            await self._http.close()
+
     def action_quit_app(self) -> None:
         """Quit the application."""
         self.exit()
 
     def action_clear_log(self) -> None:
         """Clear the chat log."""
-        self.query_one("#chat_log", RichLog).clear()
-        self.query_one("#chat_log", RichLog).write("[bold yellow]Chat cleared.[/bold yellow]")
+        self._chat_log.clear()
+        self._chat_log.write(_CLEAR_BANNER)
         self.message_history = []
+        self._last_reply = None
 
     def action_open_settings(self) -> None:
         """Open settings dialog."""
@@ -229,333 +442,420 @@ class AgentCoderApp(App):
             on_dismiss
         )
 
+    def _settings(self) -> Settings:
+        """Build Settings from the app's current provider, model, mode and LSP options."""
+        return Settings(
+            model=self.model_name,
+            model_provider=self.model_provider,
+            mode=_to_mode(self.mode),
+            lsp_enabled=self.lsp_enabled,
+            lsp_command=self.lsp_command
+        )
+
+    def _restart_agent(self, settings: Optional[Settings] = None) -> None:
+        """Re-create the agent, cancelling an initialization that is still running."""
+        self.run_worker(
+            self.initialize_agent(settings or self._settings()), exclusive=True, group="agent-init"
+        )
+
     def update_settings(self, provider, model, mode):
         self.model_provider = provider
         self.model_name = model
         self.mode = mode
         
-        log = self.query_one("#chat_log", RichLog)
+        log = self._chat_log
         log.write(f"[bold]Settings updated:[/bold] Provider={provider}, Model={model}, Mode={mode}")
         
         # Re-initialize agent
-        from src.config import Settings
-        from src.models import AgentMode
-        settings = Settings(
-            model=self.model_name,
-            model_provider=self.model_provider,
-            mode=AgentMode(self.mode)
-        )
-        self.run_worker(self.initialize_agent(settings))
+        self._restart_agent()
 
     async def on_chat_input_submitted(self, event: ChatInput.Submitted) -> None:
         """Handle input submission."""
         message = event.value
         if message:
-            log = self.query_one("#chat_log", RichLog)
-            log.write(f"[bold blue]You:[/bold blue] {message}")
+            log = self._chat_log
+            log.write(_USER_PREFIX + Text(message))
             # self.query_one("#chat_input", ChatInput).clear() # Already cleared in ChatInput
             
             # Check for slash commands
             if message.startswith("/"):
-                await self.handle_slash_command(message)
-                self.query_one("#status_bar", Label).update("")
+                # Tokenized once here; handlers get the arguments as a list
+                await self.handle_slash_command(message.split())
                 return
 
             # Call agent asynchronously
-            self.query_one("#status_bar", Label).update("Thinking...")
+            self._set_status(_STATUS_THINKING)
             self.get_response(message)
 
-    async def handle_slash_command(self, command: str) -> None:
-        """Handle slash commands."""
-        log = self.query_one("#chat_log", RichLog)
-        parts = command.strip().split()
+    async def handle_slash_command(self, parts: List[str]) -> None:
+        """Handle a slash command, given as its whitespace-split tokens."""
         cmd = parts[0].lower()
-        args = parts[1:]
-
-        if cmd == "/help":
-            help_text = """
-            [bold]Available Commands:[/bold]
-            /help       - Show this help message
-            /clear      - Clear the chat log
-            /compact    - Compact conversation history
-            /exit       - Exit the application
-            /settings   - Open settings dialog (or press 's')
-            /model      - Show or set current model
-            /provider   - Show or set current provider
-            /mode       - Show or set current mode
-            /memory     - Manage project memory
-            /doctor     - Check system health
-            /statusline - Configure status line
-            /speckit    - Run SpecKit commands
-            """
-            log.write(help_text)
-        
-        elif cmd == "/settings":
-            self.action_open_settings()
-        
-        elif cmd == "/clear":
-            log.clear()
-            log.write("[bold yellow]Chat cleared.[/bold yellow]")
-            self.message_history = []
-            
-        elif cmd == "/compact":
-            instructions = " ".join(args) if args else None
-            self.run_worker(self.compact_history(instructions))
+        handler = self._commands.get(cmd)
+        if handler:
+            await handler(parts[1:])
+        else:
+            self._chat_log.write(Text(f"Unknown command: {cmd}", style="bold red"))
+
+    async def _cmd_help(self, args: List[str]) -> None:
+        """Show the available commands."""
+        self._chat_log.write(_HELP_TEXT)
+
+    async def _cmd_settings(self, args: List[str]) -> None:
+        """Open the settings dialog."""
+        self.action_open_settings()
+
+    async def _cmd_clear(self, args: List[str]) -> None:
+        """Clear the chat log and history."""
+        log = self._chat_log
+        log.clear()
+        log.write(_CLEAR_BANNER)
+        self.message_history = []
+        self._last_reply = None
+
+    async def _cmd_compact(self, args: List[str]) -> None:
+        """Summarize the conversation history."""
+        instructions = " ".join(args) if args else None
+        self.run_worker(self.compact_history(instructions))
+
+    async def _cmd_exit(self, args: List[str]) -> None:
+        """Exit the application."""
+        self.exit()
 
-        elif cmd in ("/exit", "/quit"):
-            self.exit()
+    async def _cmd_model(self, args: List[str]) -> None:
+        """Show or change the model."""
+        log = self._chat_log
+        if args:
+            new_model = args[0]
+            self.model_name = new_model
+            log.write(f"Switching model to: [bold]{self.model_name}[/bold]")
             
-        elif cmd == "/model":
-            if args:
-                new_model = args[0]
-                self.model_name = new_model
-                log.write(f"Switching model to: [bold]{self.model_name}[/bold]")
-                
-                # Update settings
-                from src.config import Settings
-                from src.models import AgentMode
-                settings = Settings(
-                    model=self.model_name,
-                    model_provider=self.model_provider,
-                    mode=AgentMode(self.mode)
-                )
-                self.run_worker(self.initialize_agent(settings))
-            else:
-                log.write(f"Current model: [bold]{self.model_name}[/bold]")
-                log.write("Usage: /model <model_name>")
-
-        elif cmd == "/provider":
-            if args:
-                new_provider = args[0].lower()
-                if new_provider not in ["ollama", "anthropic", "claude", "google", "gemini", "openai", "gpt"]:
-                    log.write(f"[bold red]Invalid provider: {new_provider}[/bold red]")
-                    log.write("Valid providers: ollama, anthropic, google, openai")
-                    return
-                    
-                self.model_provider = new_provider
-                log.write(f"Switching provider to: [bold]{self.model_provider}[/bold]")
-                
-                # Update settings
-                from src.config import Settings
-                from src.models import AgentMode
-                settings = Settings(
-                    model=self.model_name,
-                    model_provider=self.model_provider,
-                    mode=AgentMode(self.mode)
-                )
-                self.run_worker(self.initialize_agent(settings))
-            else:
-                log.write(f"Current provider: [bold]{self.model_provider}[/bold]")
-                log.write("Usage: /provider <provider_name>")
+            self._restart_agent()
+        else:
+            self._log_many([
+                f"Current model: [bold]{self.model_name}[/bold]",
+                "Usage: /model <model_name>",
+            ])
+
+    async def _cmd_provider(self, args: List[str]) -> None:
+        """Show or change the provider."""
+        log = self._chat_log
+        if args:
+            new_provider = args[0].lower()
+            if new_provider not in _VALID_PROVIDERS:
+                self._log_many([
+                    f"[bold red]Invalid provider: {new_provider}[/bold red]",
+                    "Valid providers: ollama, anthropic, google, openai",
+                ])
+                return
                 
-        elif cmd == "/mode":
-            if args:
-                new_mode = args[0].lower()
-                try:
-                    from src.models import AgentMode
-                    mode_enum = AgentMode(new_mode)
-                    self.mode = mode_enum.value
-                    log.write(f"Switching mode to: [bold]{self.mode}[/bold]")
-                    
-                    # Update settings
-                    from src.config import Settings
-                    settings = Settings(
-                        model=self.model_name,
-                        model_provider=self.model_provider,
-                        mode=mode_enum
-                    )
-                    self.run_worker(self.initialize_agent(settings))
-                except ValueError:
-                    log.write(f"[bold red]Invalid mode: {new_mode}[/bold red]")
-                    log.write("Valid modes: auto, plan, ask")
-            else:
-                log.write(f"Current mode: [bold]{self.mode}[/bold]")
-                log.write("Usage: /mode <mode>")
+            self.model_provider = new_provider
+            log.write(f"Switching provider to: [bold]{self.model_provider}[/bold]")
             
-        elif cmd == "/doctor":
-            log.write("Checking system health...")
-            log.write(f"Current Provider: [bold]{self.model_provider}[/bold]")
-            
-            if self.model_provider == "ollama":
+            self._restart_agent()
+        else:
+            self._log_many([
+                f"Current provider: [bold]{self.model_provider}[/bold]",
+                "Usage: /provider <provider_name>",
+            ])
+
+    async def _cmd_mode(self, args: List[str]) -> None:
+        """Show or change the agent mode."""
+        log = self._chat_log
+        if args:
+            new_mode = args[0].lower()
+            try:
+                self.mode = _to_mode(new_mode).value
+                log.write(f"Switching mode to: [bold]{self.mode}[/bold]")
+                self._restart_agent()
+            except ValueError:
+                self._log_many([
+                    f"[bold red]Invalid mode: {new_mode}[/bold red]",
+                    "Valid modes: auto, plan, ask",
+                ])
+        else:
+            self._log_many([f"Current mode: [bold]{self.mode}[/bold]", "Usage: /mode <mode>"])
+
+    async def _cmd_doctor(self, args: List[str]) -> None:
+        """Check the connection to the provider."""
+        lines = [
+            "Checking system health...",
+            f"Current Provider: [bold]{self.model_provider}[/bold]",
+        ]
+        # "/doctor force" (or "refresh") skips every cached result
+        force = bool(args) and args[0].lower() in ("force", "refresh")
+        
+        if self.model_provider == "ollama":
+            # A healthy result is reused for a few seconds
+            now = time.monotonic()
+            if not force and self._doctor_cache and now - self._doctor_cache[0] < _DOCTOR_TTL:
+                lines.append(self._doctor_cache[1])
+            else:
+                self._doctor_cache = None
                 try:
-                    import aiohttp
-                    async with aiohttp.ClientSession() as session:
-                        async with session.get("http://localhost:11434/") as resp:
-                            if resp.status == 200:
-                                log.write("[bold green]Ollama is running and accessible.[/bold green]")
-                            else:
-                                log.write(f"[bold red]Ollama returned status {resp.status}[/bold red]")
+                    # A dead Ollama should fail the probe quickly
+                    async with self._http_session().get(
+                        "http://localhost:11434/", timeout=aiohttp.ClientTimeout(total=2)
+                    ) as resp:
+                        if resp.status == 200:
+                            message = "[bold green]Ollama is running and accessible.[/bold green]"
+                            self._doctor_cache = (now, message)
+                            lines.append(message)
+                        else:
+                            lines.append(f"[bold red]Ollama returned status {resp.status}[/bold red]")
+                except asyncio.TimeoutError:
+                    lines.append("[bold red]Timed out connecting to Ollama.[/bold red]")
                 except Exception as e:
-                    log.write(f"[bold red]Error connecting to Ollama: {e}[/bold red]")
-            elif self.model_provider in ("anthropic", "claude"):
-                if "ANTHROPIC_API_KEY" in os.environ:
-                    log.write("[bold green]ANTHROPIC_API_KEY found in environment.[/bold green]")
-                else:
-                    log.write("[bold red]ANTHROPIC_API_KEY not found in environment.[/bold red]")
-            elif self.model_provider in ("google", "gemini"):
-                if "GEMINI_API_KEY" in os.environ:
-                    log.write("[bold green]GEMINI_API_KEY found in environment.[/bold green]")
-                else:
-                    log.write("[bold red]GEMINI_API_KEY not found in environment.[/bold red]")
-            elif self.model_provider in ("openai", "gpt"):
-                if "OPENAI_API_KEY" in os.environ:
-                    log.write("[bold green]OPENAI_API_KEY found in environment.[/bold green]")
-                else:
-                    log.write("[bold red]OPENAI_API_KEY not found in environment.[/bold red]")
+                    lines.append(f"[bold red]Error connecting to Ollama: {e}[/bold red]")
+        elif self.model_provider in _PROVIDER_ENV:
+            env_var = _PROVIDER_ENV[self.model_provider]
+            if force or env_var not in self._env_present:
+                self._env_present[env_var] = os.environ.get(env_var) is not None
+            if self._env_present[env_var]:
+                lines.append(f"[bold green]{env_var} found in environment.[/bold green]")
             else:
-                log.write(f"[yellow]No specific health check for provider: {self.model_provider}[/yellow]")
-
-        elif cmd == "/memory":
-            import os
-            memory_path = "AGENT_MEMORY.md"
-            if not args:
-                # Show memory
-                if os.path.exists(memory_path):
-                    try:
-                        with open(memory_path, "r") as f:
-                            content = f.read()
-                        log.write(f"[bold]Project Memory ({memory_path}):[/bold]\n{content}")
-                    except Exception as e:
-                        log.write(f"[bold red]Error reading memory: {e}[/bold red]")
+                lines.append(f"[bold red]{env_var} not found in environment.[/bold red]")
+        else:
+            lines.append(f"[yellow]No specific health check for provider: {self.model_provider}[/yellow]")
+        self._log_many(lines)
+
+    async def _cmd_memory(self, args: List[str]) -> None:
+        """Show or add to the project memory."""
+        log = self._chat_log
+        memory_path = _MEMORY_PATH
+        if not args or args == ["full"]:
+            # Show memory, including additions still waiting to be flushed
+            await self._flush_memory()
+            try:
+                if args:
+                    content = await asyncio.to_thread(_read_memory, memory_path)
+                    cut = False
                 else:
-                    log.write("[yellow]No project memory found (AGENT_MEMORY.md). Use '/memory <text>' to add one.[/yellow]")
-            else:
-                # Add to memory
-                new_memory = " ".join(args)
-                try:
-                    with open(memory_path, "a") as f:
-                        f.write(f"\n- {new_memory}")
-                    log.write(f"[green]Added to memory:[/green] {new_memory}")
-                    # Re-initialize agent to pick up new memory? 
-                    # Ideally yes, but for now let's just inform user.
-                    log.write("[dim]Note: Restart session or run /init (not impl) to apply changes to agent context immediately.[/dim]")
-                except Exception as e:
-                    log.write(f"[bold red]Error writing memory: {e}[/bold red]")
-                
-        elif cmd == "/statusline":
-            log.write("[bold]Status Line Configuration:[/bold]")
-            log.write("To configure a custom status line, you can update your settings or use environment variables.")
-            log.write("Currently, the status line shows the agent's thinking status.")
-            log.write("Future versions will support custom shell commands for status line.")
-            
-        elif cmd == "/speckit":
-            if not args:
-                log.write("[bold]SpecKit Commands:[/bold]")
-                log.write("Usage: /speckit <command>")
-                log.write("Commands: init, plan, specify, tasks, implement, analyze, clarify, constitution, checklist")
+                    # Only the end of a large file is read; "/memory full" reads it all
+                    tail = await asyncio.to_thread(_read_memory_tail, memory_path)
+                    content, cut = tail if tail else (None, False)
+            except Exception as e:
+                log.write(Text(f"Error reading memory: {e}", style="bold red"))
                 return
+            if content is not None:
+                # Show only the tail of a memory file too long to fit in the log
+                lines = content.splitlines()
+                limit = log.max_lines - 1 if log.max_lines else None
+                if limit and len(lines) > limit:
+                    content = "\n".join(lines[-limit:])
+                    log.write(f"[bold]Project Memory ({memory_path}, last {limit} lines):[/bold]\n{content}")
+                elif cut:
+                    log.write(
+                        f"[bold]Project Memory ({memory_path}, end of file; '/memory full' shows all):[/bold]\n…\n{content}"
+                    )
+                else:
+                    log.write(f"[bold]Project Memory ({memory_path}):[/bold]\n{content}")
+            else:
+                log.write("[yellow]No project memory found (AGENT_MEMORY.md). Use '/memory <text>' to add one.[/yellow]")
+        else:
+            # Add to memory
+            new_memory = " ".join(args)
+            # Buffered and written on the next flush tick, or right away once the buffer fills
+            self._memory_buf.append(new_memory)
+            if len(self._memory_buf) >= _MEMORY_BUF_MAX:
+                await self._flush_memory()
+            lines = [f"[green]Added to memory:[/green] {new_memory}"]
+            # The running agent picks it up on its next reply; a rebuilt one reads it from the file
+            if self.agent and hasattr(self.agent, "append_memory"):
+                self.agent.append_memory(new_memory)
+                # Earlier replies were given without this memory
+                self._last_reply = None
+                lines.append("[dim]Applied to the current session.[/dim]")
+            self._log_many(lines)
+
+    async def _cmd_statusline(self, args: List[str]) -> None:
+        """Describe status line configuration."""
+        self._log_many([
+            "[bold]Status Line Configuration:[/bold]",
+            "To configure a custom status line, you can update your settings or use environment variables.",
+            "Currently, the status line shows the agent's thinking status.",
+            "Future versions will support custom shell commands for status line.",
+        ])
+
+    async def _cmd_speckit(self, args: List[str]) -> None:
+        """Install SpecKit or run one of its commands."""
+        log = self._chat_log
+        if not args:
+            self._log_many([
+                "[bold]SpecKit Commands:[/bold]",
+                "Usage: /speckit <command>",
+                "Commands: init, plan, specify, tasks, implement, analyze, clarify, constitution, checklist",
+            ])
+            return
 
-            subcmd = args[0].lower()
+        subcmd = args[0].lower()
+        
+        if subcmd == "init":
+            try:
+                # Copies many files, so keep it off the event loop
+                await asyncio.to_thread(install_speckit, os.getcwd())
+                self._log_many([
+                    "[bold green]SpecKit initialized successfully.[/bold green]",
+                    "Skills have been installed to .agent-coder/skills/",
+                    "You may need to restart the session to load the new skills.",
+                ])
+            except Exception as e:
+                log.write(Text(f"Error initializing SpecKit: {e}", style="bold red"))
+        else:
+            # Check if skill exists
+            skill_name = f"speckit-{subcmd}"
+            # We need access to the agent's tools to check for get_skill
+            # But we can just try to invoke the agent with the skill prompt if we can find it.
+            # Or better, we can read the skill file directly if we know where it is.
             
-            if subcmd == "init":
-                from src.agent.speckit import install_speckit
-                try:
-                    import os
-                    install_speckit(os.getcwd())
-                    log.write("[bold green]SpecKit initialized successfully.[/bold green]")
-                    log.write("Skills have been installed to .agent-coder/skills/")
-                    log.write("You may need to restart the session to load the new skills.")
-                except Exception as e:
-                    log.write(f"[bold red]Error initializing SpecKit: {e}[/bold red]")
-            else:
-                # Check if skill exists
-                skill_name = f"speckit-{subcmd}"
-                # We need access to the agent's tools to check for get_skill
-                # But we can just try to invoke the agent with the skill prompt if we can find it.
-                # Or better, we can read the skill file directly if we know where it is.
+            skill_path = os.path.join(os.getcwd(), ".agent-coder", "skills", f"{skill_name}.md")
+            content = await asyncio.to_thread(_read_skill_prompt, skill_path)
+            if content is not None:
+                # Send to agent
+                log.write(
+                    Text.from_markup(f"[bold blue]Executing SpecKit command: {subcmd}[/bold blue]\n")
+                    + _USER_PREFIX + Text(f"/speckit {subcmd}")
+                )
+                self._set_status(_STATUS_THINKING)
                 
-                import os
-                skill_path = os.path.join(os.getcwd(), ".agent-coder", "skills", f"{skill_name}.md")
-                if os.path.exists(skill_path):
-                    # Read skill content
-                    with open(skill_path, "r") as f:
-                        content = f.read()
-                        # Strip frontmatter
-                        if content.startswith("---"):
-                            parts = content.split("---", 2)
-                            if len(parts) >= 3:
-                                content = parts[2].strip()
-                    
-                    # Send to agent
-                    log.write(f"[bold blue]Executing SpecKit command: {subcmd}[/bold blue]")
-                    self.query_one("#chat_log", RichLog).write(f"[bold blue]You:[/bold blue] /speckit {subcmd}")
-                    self.query_one("#status_bar", Label).update("Thinking...")
-                    
-                    # We append the user's extra args if any
-                    user_args = " ".join(args[1:])
-                    prompt = f"{content}\n\nUser Input:\n{user_args}"
-                    
-                    self.get_response(prompt)
-                else:
-                    log.write(f"[bold red]SpecKit command '{subcmd}' not found or not initialized.[/bold red]")
-                    log.write("Run '/speckit init' to initialize SpecKit.")
-            
-
-        elif cmd == "/lsp":
-            if not args:
-                status = "Enabled" if self.lsp_enabled else "Disabled"
-                log.write(f"[bold]LSP Status:[/bold] {status}")
-                log.write(f"[bold]Command:[/bold] {self.lsp_command}")
-                log.write("Usage: /lsp [on|off|<command>]")
-            else:
-                arg = args[0]
-                if arg.lower() == "on":
-                    self.lsp_enabled = True
-                    log.write("[bold green]LSP Enabled.[/bold green]")
-                elif arg.lower() == "off":
-                    self.lsp_enabled = False
-                    log.write("[bold yellow]LSP Disabled.[/bold yellow]")
-                else:
-                    self.lsp_command = " ".join(args)
-                    self.lsp_enabled = True
-                    log.write(f"[bold green]LSP Command set to: {self.lsp_command}[/bold green]")
+                # We append the user's extra args if any
+                user_args = " ".join(args[1:])
+                prompt = f"{content}\n\nUser Input:\n{user_args}"
                 
-                # Re-initialize agent
-                from src.config import Settings
-                from src.models import AgentMode
-                settings = Settings(
-                    model=self.model_name,
-                    model_provider=self.model_provider,
-                    mode=AgentMode(self.mode),
-                    lsp_enabled=self.lsp_enabled,
-                    lsp_command=self.lsp_command
-                )
-                self.run_worker(self.initialize_agent(settings))
+                self.get_response(prompt)
+            else:
+                self._log_many([
+                    f"[bold red]SpecKit command '{subcmd}' not found or not initialized.[/bold red]",
+                    "Run '/speckit init' to initialize SpecKit.",
+                ])
+
+    async def _cmd_mcp(self, args: List[str]) -> None:
+        """List connected MCP servers, or reconnect them after a config change."""
+        log = self._chat_log
+        if args and args[0].lower() == "reload":
+            log.write("Reloading MCP servers...")
+            self.run_worker(self._reload_mcp(), exclusive=True, group="agent-init")
+            return
+        sessions = self.mcp_manager.sessions
+        if not sessions:
+            log.write("[yellow]No MCP servers connected.[/yellow]")
+            return
+        self._log_many(
+            [f"[bold]MCP Servers ({len(self.mcp_manager.tools)} tools):[/bold]"]
+            + [f"- {name}" for name in sessions]
+        )
 
+    async def _reload_mcp(self) -> None:
+        """Reconnect all MCP servers and rebuild the agent with their tools."""
+        self._set_status(_STATUS_CONNECTING)
+        if self._mcp_connect and not self._mcp_connect.done():
+            await asyncio.shield(self._mcp_connect)
+        self._mcp_connect = asyncio.create_task(self.mcp_manager.reload())
+        await asyncio.shield(self._mcp_connect)
+        self._chat_log.write(
+            f"[green]Connected to {len(self.mcp_manager.sessions)} MCP server(s).[/green]"
+        )
+        await self.initialize_agent(self._settings())
+
+    async def _cmd_lsp(self, args: List[str]) -> None:
+        """Show or change LSP support."""
+        log = self._chat_log
+        if not args:
+            status = "Enabled" if self.lsp_enabled else "Disabled"
+            self._log_many([
+                f"[bold]LSP Status:[/bold] {status}",
+                f"[bold]Command:[/bold] {self.lsp_command}",
+                "Usage: /lsp [on|off|<command>]",
+            ])
         else:
-            log.write(f"[bold red]Unknown command: {cmd}[/bold red]")
+            arg = args[0]
+            if arg.lower() == "on":
+                self.lsp_enabled = True
+                log.write("[bold green]LSP Enabled.[/bold green]")
+            elif arg.lower() == "off":
+                self.lsp_enabled = False
+                log.write("[bold yellow]LSP Disabled.[/bold yellow]")
+            else:
+                self.lsp_command = " ".join(args)
+                self.lsp_enabled = True
+                log.write(f"[bold green]LSP Command set to: {self.lsp_command}[/bold green]")
+            
+            # Re-initialize agent
+            self._restart_agent()
 
     @work(exclusive=True)
     async def get_response(self, message: str) -> None:
         """Get response from agent."""
-        log = self.query_one("#chat_log", RichLog)
-        status = self.query_one("#status_bar", Label)
+        log = self._chat_log
+        key = (self.model_provider, self.model_name, self.mode, message)
+        last = self._last_reply
+        if self.agent and last and last[0] == key and last[1] is self.message_history:
+            # The prompt just answered, resubmitted before anything else changed:
+            # repeat the reply, but still run the hooks and record the exchange
+            reply = last[2]
+            if hasattr(self.agent, 'hook_manager'):
+                await self.agent.hook_manager.trigger(HookEvent.USER_PROMPT_SUBMIT, {"user_input": message})
+            self.message_history = self.message_history + [
+                ModelRequest(parts=[UserPromptPart(content=message)]),
+                ModelResponse(parts=[TextPart(content=reply)]),
+            ]
+            self._last_reply = (key, self.message_history, reply)
+            log.write(_AGENT_PREFIX + Text(reply))
+            self._set_status(_STATUS_CLEAR)
+            return
+        self._last_reply = None
         try:
-            from src.agent.core import get_agent_response
             if self.agent:
-                response, new_history = await get_agent_response(self.agent, message, self.message_history)
-                self.message_history = new_history
-                log.write(f"[bold green]Agent:[/bold green] {response}")
+                # Deltas are buffered and written by the _flush_log timer, so the
+                # log refreshes at a fixed rate however fast tokens arrive
+                streamed: List[str] = []
+                self._log_buffer = []
+                self._reply_started = False
+                
+                def on_text(delta: str) -> None:
+                    streamed.append(delta)
+                    self._log_buffer.append(delta)
+                
+                self._log_timer.resume()
+                try:
+                    response, new_history = await stream_agent_response(
+                        self.agent, message, self.message_history, on_text
+                    )
+                finally:
+                    self._log_timer.pause()
+                previous, self.message_history = self.message_history, new_history
+                # Text written before tool calls streams too, so the reply is what ends the stream
+                if "".join(streamed).endswith(response):
+                    self._flush_log(final=True)
+                    # Only replies that streamed normally and ran no tools may be repeated;
+                    # errors come back unstreamed
+                    if response and not any(
+                        isinstance(part, ToolCallPart)
+                        for m in new_history[len(previous):] for part in m.parts
+                    ):
+                        self._last_reply = (key, new_history, response)
+                else:
+                    # The reply didn't stream (or an error replaced it), show the final text
+                    if self._log_buffer:
+                        self._flush_log(final=True)
+                    self._write_reply(response)
             else:
-                log.write("[bold red]Error:[/bold red] Agent not initialized.")
+                log.write(_ERR_PREFIX + Text("Agent not initialized."))
         except Exception as e:
-            log.write(f"[bold red]Error:[/bold red] {str(e)}")
+            log.write(_ERR_PREFIX + Text(str(e)))
         finally:
-            status.update("")
+            self._set_status(_STATUS_CLEAR)
 
     async def compact_history(self, instructions: str = None) -> None:
         """Compact conversation history."""
-        log = self.query_one("#chat_log", RichLog)
-        status = self.query_one("#status_bar", Label)
+        log = self._chat_log
         
         if not self.message_history:
             log.write("[yellow]No history to compact.[/yellow]")
             return
 
-        status.update("Compacting history...")
+        self._set_status(_STATUS_COMPACTING)
         
         # Trigger PreCompact hook
-        from src.agent.hooks import HookEvent
         if self.agent and hasattr(self.agent, 'hook_manager'):
             await self.agent.hook_manager.trigger(HookEvent.PRE_COMPACT, {
                 "instructions": instructions,
@@ -578,7 +878,7 @@ class AgentCoderApp(App):
         try:
             # Run summarization using the agent (without history)
             result = await self.agent.run(summary_prompt)
-            summary = result.data
+            summary = result.output
             
             # Create new history
             new_history = [
@@ -587,14 +887,17 @@ class AgentCoderApp(App):
             ]
             
             self.message_history = new_history
-            log.write(f"[bold green]Conversation compacted.[/bold green]")
-            log.write(f"[dim]Summary: {summary[:100]}...[/dim]")
+            self._log_many([
+                "[bold green]Conversation compacted.[/bold green]",
+                f"[dim]Summary: {summary[:100]}...[/dim]",
+            ])
             
         except Exception as e:
-            log.write(f"[bold red]Error compacting history: {e}[/bold red]")
+            log.write(Text(f"Error compacting history: {e}", style="bold red"))
         finally:
-            status.update("")
+            self._set_status(_STATUS_CLEAR)
 
 if __name__ == "__main__":
     app = AgentCoderApp()
+    install_uvloop()
     app.run()
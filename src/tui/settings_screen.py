@@ -2,6 +2,11 @@ from textual.app import ComposeResult
 from textual.widgets import Label, Button, Input, Select
 from textual.containers import Grid
 from textual.screen import ModalScreen
+from src.models import AgentMode
+
+# (label, value) choices for the dialog's selects, built once
+_PROVIDER_OPTIONS = tuple((p, p) for p in ("ollama", "anthropic", "google", "openai"))
+_MODE_OPTIONS = tuple((m.value, m.value) for m in AgentMode)
 
 class SettingsScreen(ModalScreen):
     """Screen for configuring settings."""
@@ -16,7 +21,7 @@ class SettingsScreen(ModalScreen):
         yield Grid(
             Label("Provider:", classes="label"),
             Select(
-                [(p, p) for p in ["ollama", "anthropic", "google", "openai"]],
+                _PROVIDER_OPTIONS,
                 value=self.provider,
                 id="provider_select",
                 allow_blank=False
@@ -25,7 +30,7 @@ class SettingsScreen(ModalScreen):
             Input(value=self.model, id="model_input"),
             Label("Mode:", classes="label"),
             Select(
-                [(m, m) for m in ["auto", "plan", "ask"]],
+                _MODE_OPTIONS,
                 value=self.mode,
                 id="mode_select",
                 allow_blank=False
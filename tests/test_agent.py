@@ -16,9 +16,10 @@ async def test_agent():
         # Check if we can get a response (timeout if Ollama not running)
         # using a very short timeout
         try:
-            response = await asyncio.wait_for(get_agent_response(agent, "Say hello"), timeout=30.0)
+            async with asyncio.timeout(30.0):
+                response = await get_agent_response(agent, "Say hello")
             print(f"Agent response: {response}")
-        except asyncio.TimeoutError:
+        except TimeoutError:
             print("Timeout waiting for Ollama. Is it running?")
         except Exception as e:
             print(f"Error during inference: {e}")
@@ -0,0 +1,46 @@
+import json
+from pydantic_ai.messages import ToolReturnPart
+from pydantic_ai.models.function import DeltaToolCall, FunctionModel
+from src.config import Settings
+from src.models import AgentMode
+from src.agent.core import _batch_prompt, _split_batch_answers, create_agent, stream_agent_response
+
+def test_batch_prompt_numbers_queries():
+    prompt = _batch_prompt(["first?", "second?"])
+    assert "2 independent questions" in prompt
+    assert "Q1: first?\n---\nQ2: second?" in prompt
+
+def test_split_batch_answers():
+    output = "Sure.\nA1: one\n---\nA2: two\nlines"
+    assert _split_batch_answers(output, 2) == ["one", "two\nlines"]
+
+def test_split_batch_answers_markdown_labels():
+    assert _split_batch_answers("**A1:** one\n**A2**: two", 2) == ["one", "two"]
+
+def test_split_batch_answers_out_of_order():
+    assert _split_batch_answers("A2: two\nA1: one", 2) == ["one", "two"]
+
+def test_split_batch_answers_missing():
+    assert _split_batch_answers("A1: one\nA3: three", 3) is None
+    assert _split_batch_answers("no labels here", 1) is None
+
+async def test_stream_runs_tool_calls_after_text(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    target = tmp_path / "out.txt"
+
+    async def stream(messages, info):
+        if any(isinstance(part, ToolReturnPart) for message in messages for part in message.parts):
+            yield "Done."
+            return
+        # Text first, then a tool call in the same response
+        yield "I'll write it. "
+        yield {0: DeltaToolCall(name="write_file", json_args=json.dumps({"path": str(target), "content": "hi"}))}
+
+    agent = create_agent(settings=Settings(mode=AgentMode.AUTO))
+    streamed = []
+    with agent.override(model=FunctionModel(stream_function=stream)):
+        response, history = await stream_agent_response(agent, "write out.txt", on_text=streamed.append)
+    assert target.read_text() == "hi"
+    assert response == "Done."
+    assert "".join(streamed) == "I'll write it. \nDone."
+    assert len(history) == 4
@@ -0,0 +1,28 @@
+import os
+import pytest
+from src.agent.filecache import mtime_cached, read_text_cached
+
+def test_mtime_cached_rereads_only_on_change(tmp_path):
+    path = tmp_path / "notes.md"
+    path.write_text("one")
+    cache = {}
+    loads = []
+    load = lambda p: loads.append(p) or open(p).read()
+    assert mtime_cached(cache, str(path), load) == "one"
+    assert mtime_cached(cache, str(path), load) == "one"
+    assert len(loads) == 1
+    path.write_text("two")
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))
+    assert mtime_cached(cache, str(path), load) == "two"
+    assert len(loads) == 2
+
+def test_mtime_cached_missing_file(tmp_path):
+    path = tmp_path / "notes.md"
+    path.write_text("one")
+    cache = {}
+    read_text_cached(str(path))
+    mtime_cached(cache, str(path), lambda p: "x")
+    path.unlink()
+    with pytest.raises(FileNotFoundError):
+        mtime_cached(cache, str(path), lambda p: "x")
+    assert str(path) not in cache
@@ -0,0 +1,97 @@
+import sys
+import json
+import msgspec
+import pytest
+from src.agent import hooks
+from src.agent.hooks import HookConfig, HookManager, _command_argv
+
+def test_command_argv_plain_commands():
+    assert _command_argv("python hook.py --flag") == ["python", "hook.py", "--flag"]
+    assert _command_argv("echo 'a b' \"c d\"") == ["echo", "a b", "c d"]
+    # Single quotes keep everything literal
+    assert _command_argv("echo '$HOME `date` *'") == ["echo", "$HOME `date` *"]
+
+def test_command_argv_needs_shell():
+    for command in (
+        "cat file | grep x",
+        "echo $HOME",
+        "echo *.py",
+        'echo "$HOME"',
+        'echo "$(date)"',
+        'echo "`date`"',
+        'echo "a\\"b"',
+        "FOO=1 python hook.py",
+        "cd src",
+        "source env.sh",
+        ". env.sh",
+        "export FOO=1",
+        "echo 'unterminated",
+        "",
+    ):
+        assert _command_argv(command) is None, command
+
+_ECHO_WORKER = """
+import os, sys
+for line in sys.stdin:
+    sys.stderr.write("x" * 100000)
+    sys.stderr.flush()
+    print(os.getpid(), len(line), flush=True)
+"""
+
+async def test_streaming_worker_reused_across_events(tmp_path):
+    script = tmp_path / "worker.py"
+    script.write_text(_ECHO_WORKER)
+    manager = HookManager(str(tmp_path / "missing.json"))
+    command = f"{sys.executable} {script}"
+    # Noisy stderr must not fill a pipe nobody reads
+    first = await manager._run_streaming(command, b'{"a": 1}')
+    second = await manager._run_streaming(command, b'{"a": 2}')
+    assert first.split()[0] == second.split()[0]
+    assert first.split()[1] == b"9"
+    process = manager._workers[command]
+    await manager.aclose()
+    assert process.returncode is not None
+    assert not manager._workers
+
+async def test_streaming_worker_timeout(tmp_path, monkeypatch):
+    script = tmp_path / "silent.py"
+    script.write_text("import sys\nfor line in sys.stdin:\n    pass\n")
+    monkeypatch.setattr(hooks, "_STREAMING_TIMEOUT", 0.2)
+    manager = HookManager(str(tmp_path / "missing.json"))
+    command = f"{sys.executable} {script}"
+    with pytest.raises(RuntimeError, match="did not reply"):
+        await manager._run_streaming(command, b"{}")
+    assert command not in manager._workers
+
+async def test_streaming_worker_exit(tmp_path):
+    manager = HookManager(str(tmp_path / "missing.json"))
+    command = f"{sys.executable} -c pass"
+    with pytest.raises(RuntimeError, match="exited with code 0"):
+        await manager._run_streaming(command, b"{}")
+    assert command not in manager._workers
+
+def test_index_keeps_hooks_json_order():
+    config = msgspec.json.decode(json.dumps({"hooks": {"PreToolUse": [
+        {"matcher": "write_file", "hooks": [{"type": "command", "command": "a"}]},
+        {"matcher": "*", "hooks": [{"type": "command", "command": "b"}]},
+        {"matcher": "write_file", "hooks": [{"type": "command", "command": "c"}]},
+        {"matcher": "read_file", "hooks": [{"type": "command", "command": "d"}]},
+    ]}}).encode(), type=HookConfig)
+    by_name, wildcard, every = HookManager._build_index(config)[HookManager.event_id(hooks.HookEvent.PRE_TOOL_USE)]
+    commands = lambda actions: [a.command for a in actions]
+    assert commands(by_name["write_file"]) == ["a", "b", "c"]
+    assert commands(by_name["read_file"]) == ["b", "d"]
+    assert commands(wildcard) == ["b"]
+    assert commands(every) == ["a", "b", "c", "d"]
+
+async def test_dispatch_runs_in_hooks_json_order(tmp_path):
+    log = tmp_path / "order.log"
+    rules = [
+        {"matcher": name, "hooks": [{"type": "command", "command": f"{sys.executable} -c \"open('{log}', 'a').write('{name}')\""}]}
+        for name in ("write_file", "*")
+    ]
+    config = tmp_path / "hooks.json"
+    config.write_text(json.dumps({"hooks": {"PreToolUse": rules}}))
+    manager = HookManager(str(config))
+    await manager.trigger(hooks.HookEvent.PRE_TOOL_USE, {"tool_name": "write_file"})
+    assert log.read_text() == "write_file*"
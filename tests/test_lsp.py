@@ -0,0 +1,166 @@
+import os
+import sys
+import json
+import asyncio
+from src.config import Settings
+from src.agent.lsp import JSONRPCClient
+from src.agent.lsp_manager import LSPManager
+
+# Minimal LSP server: logs every method it receives and answers requests
+_FAKE_SERVER = """
+import sys, json
+log = open(sys.argv[1], "a")
+stdin, stdout = sys.stdin.buffer, sys.stdout.buffer
+results = {
+    "initialize": {"capabilities": {}},
+    "textDocument/hover": {"contents": {"value": "def f()"}},
+    "textDocument/definition": [{"uri": "file:///a.py"}],
+    "textDocument/references": [{"uri": "file:///b.py"}],
+}
+while True:
+    header = b""
+    while not header.endswith(b"\\r\\n\\r\\n"):
+        ch = stdin.read(1)
+        if not ch:
+            sys.exit()
+        header += ch
+    length = int(header.split(b":")[1].split(b"\\r")[0])
+    message = json.loads(stdin.read(length))
+    version = message.get("params", {}).get("textDocument", {}).get("version")
+    log.write(message["method"] + ("" if version is None else f":{version}") + "\\n")
+    log.flush()
+    if "id" in message:
+        body = json.dumps({"jsonrpc": "2.0", "id": message["id"], "result": results.get(message["method"])}).encode()
+        stdout.write(b"Content-Length: %d\\r\\n\\r\\n%s" % (len(body), body))
+        stdout.flush()
+"""
+
+def _start_manager(tmp_path, monkeypatch):
+    server = tmp_path / "server.py"
+    server.write_text(_FAKE_SERVER)
+    log = tmp_path / "server.log"
+    monkeypatch.chdir(tmp_path)
+    manager = LSPManager(Settings(lsp_enabled=True, lsp_command=f"{sys.executable} {server} {log}"))
+    manager.start()
+    source = tmp_path / "mod.py"
+    source.write_text("def f():\n    pass\n")
+    return manager, str(source), log
+
+def _requests(log):
+    return [m for m in log.read_text().split() if m.startswith("textDocument/") and not m.startswith("textDocument/did")]
+
+async def test_single_lookups_send_one_request(tmp_path, monkeypatch):
+    manager, source, log = _start_manager(tmp_path, monkeypatch)
+    try:
+        assert await manager.lsp_hover(source, 1, 4) == "def f()"
+        assert _requests(log) == ["textDocument/hover"]
+        assert "a.py" in await manager.lsp_definition(source, 1, 4)
+        assert _requests(log) == ["textDocument/hover", "textDocument/definition"]
+    finally:
+        await manager.stop()
+
+async def test_symbol_info_is_batched_and_cached(tmp_path, monkeypatch):
+    manager, source, log = _start_manager(tmp_path, monkeypatch)
+    try:
+        info = await manager.lsp_symbol_info(source, 1, 4)
+        assert "def f()" in info and "a.py" in info and "b.py" in info
+        assert sorted(_requests(log)) == ["textDocument/definition", "textDocument/hover", "textDocument/references"]
+        # Follow-up lookups at the same position come from the cache
+        assert "b.py" in await manager.lsp_references(source, 1, 4)
+        await manager.lsp_symbol_info(source, 1, 4)
+        assert len(_requests(log)) == 3
+        # A write to any file invalidates cross-file results
+        await manager.on_post_tool_use({"tool_name": "write_file", "args": [str(tmp_path / "other.py")], "kwargs": {}})
+        await manager.lsp_references(source, 1, 4)
+        assert len(_requests(log)) == 4
+    finally:
+        await manager.stop()
+
+async def test_writes_are_debounced_into_one_save(tmp_path, monkeypatch):
+    manager, source, log = _start_manager(tmp_path, monkeypatch)
+    other = tmp_path / "other.py"
+    try:
+        await manager.lsp_hover(source, 1, 4)
+        # Two writes inside the debounce window, plus one to a file the server never opened
+        for step, content in enumerate(("def f():\n    return 1\n", "def f():\n    return 2\n"), 1):
+            with open(source, "w") as f:
+                f.write(content)
+            # Filesystems with coarse mtimes would otherwise hide the change
+            mtime = os.stat(source).st_mtime_ns + step * 10**9
+            os.utime(source, ns=(mtime, mtime))
+            await manager.on_post_tool_use({"tool_name": "write_file", "args": [source, content], "kwargs": {}})
+        other.write_text("x = 1\n")
+        await manager.on_post_tool_use({"tool_name": "write_file", "kwargs": {"path": str(other), "content": ""}})
+        await asyncio.sleep(0.3)
+        synced = [m for m in log.read_text().split() if m.startswith("textDocument/did")]
+        assert synced == ["textDocument/didOpen:1", "textDocument/didChange:2", "textDocument/didSave"]
+        # A save still pending when the manager stops is dropped
+        await manager.on_post_tool_use({"tool_name": "write_file", "args": [source], "kwargs": {}})
+        assert manager._save_timers
+    finally:
+        await manager.stop()
+    assert not manager._save_timers
+    await asyncio.sleep(0.1)
+    assert not manager._save_tasks
+
+# Answers each request with its own params, or an error for method "fail"
+_ECHO_SERVER = """
+import sys, json
+stdin, stdout = sys.stdin.buffer, sys.stdout.buffer
+while True:
+    header = b""
+    while not header.endswith(b"\\r\\n\\r\\n"):
+        ch = stdin.read(1)
+        if not ch:
+            sys.exit()
+        header += ch
+    message = json.loads(stdin.read(int(header.split(b":")[1].split(b"\\r")[0])))
+    if "id" not in message:
+        continue
+    if message["method"] == "fail":
+        reply = {"jsonrpc": "2.0", "id": message["id"], "error": {"code": -1, "message": "nope"}}
+    else:
+        reply = {"jsonrpc": "2.0", "id": message["id"], "result": message["params"]}
+    body = json.dumps(reply).encode()
+    # Headers and body in separate writes, so the client sees split frames
+    stdout.write(b"Content-Length: %d\\r\\n\\r\\n" % len(body))
+    stdout.flush()
+    stdout.write(body)
+    stdout.flush()
+"""
+
+def test_frame_counts_bytes():
+    client = JSONRPCClient(["true"], ".")
+    frame = client._frame({"text": "é"})
+    header, body = frame.split(b"\r\n\r\n", 1)
+    assert header == b"Content-Length: %d" % len(body)
+    assert json.loads(body) == {"text": "é"}
+
+async def test_requests_and_batches(tmp_path):
+    server = tmp_path / "echo.py"
+    server.write_text(_ECHO_SERVER)
+    client = JSONRPCClient([sys.executable, str(server)], str(tmp_path))
+    await client.start()
+    try:
+        assert await client.send_request("echo", {"n": 1}) == {"n": 1}
+        results = await client.send_batch([("echo", {"n": 2}), ("fail", {}), ("echo", {"n": 3})])
+        assert results[0] == {"n": 2} and results[2] == {"n": 3}
+        assert isinstance(results[1], Exception)
+        # Concurrent requests are matched back to their callers by id
+        replies = await asyncio.gather(*(client.send_request("echo", {"n": n}) for n in range(20)))
+        assert replies == [{"n": n} for n in range(20)]
+        assert not client.pending_requests
+    finally:
+        await client.stop()
+
+def test_dispatch_accepts_batch_arrays():
+    client = JSONRPCClient(["true"], ".")
+    loop = asyncio.new_event_loop()
+    try:
+        futures = {i: loop.create_future() for i in (1, 2)}
+        client.pending_requests.update(futures)
+        client._dispatch([{"id": 2, "result": "b"}, {"id": 1, "result": "a"}, {"method": "note"}])
+        assert futures[1].result() == {"id": 1, "result": "a"}
+        assert futures[2].result() == {"id": 2, "result": "b"}
+    finally:
+        loop.close()
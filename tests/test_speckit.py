@@ -0,0 +1,58 @@
+import os
+import shutil
+from src.agent import speckit
+
+_RESOURCES = os.path.join(os.path.dirname(os.path.dirname(speckit.__file__)), "resources", "speckit")
+
+def _installer(tmp_path, monkeypatch):
+    """Point install_speckit at a private copy of the installer and its resources."""
+    package = tmp_path / "pkg"
+    shutil.copytree(_RESOURCES, package / "resources" / "speckit")
+    (package / "agent").mkdir()
+    installer = package / "agent" / "speckit.py"
+    shutil.copy2(speckit.__file__, installer)
+    monkeypatch.setattr(speckit, "__file__", str(installer))
+    return package / "resources" / "speckit", installer
+
+def _mtimes(root):
+    return {
+        os.path.relpath(os.path.join(d, name), root): os.stat(os.path.join(d, name)).st_mtime_ns
+        for d, _, files in os.walk(root) for name in files
+    }
+
+def test_install_is_incremental(tmp_path, monkeypatch):
+    resources, installer = _installer(tmp_path, monkeypatch)
+    project = tmp_path / "project"
+    project.mkdir()
+    outputs = project / ".agent-coder"
+
+    speckit.install_speckit(str(project))
+    first = _mtimes(outputs)
+    skill = outputs / "skills" / "speckit-plan.md"
+    script = outputs / "speckit" / "scripts" / "setup-plan.sh"
+    assert b"name: speckit-plan" in skill.read_bytes()
+    assert b"{SCRIPT}" not in skill.read_bytes()
+    assert b".specify/templates" not in script.read_bytes()
+    assert b".agent-coder/speckit/templates" in script.read_bytes()
+    assert os.access(script, os.X_OK)
+
+    # Nothing changed: nothing is rewritten
+    speckit.install_speckit(str(project))
+    assert _mtimes(outputs) == first
+
+    # A newer source only re-copies that file
+    os.utime(resources / "templates" / "plan-template.md")
+    speckit.install_speckit(str(project))
+    second = _mtimes(outputs)
+    changed = {path for path in first if first[path] != second[path]}
+    assert changed == {os.path.join("speckit", "templates", "plan-template.md")}
+
+    # A newer installer redoes every patched output, but not the plain copies
+    os.utime(installer)
+    speckit.install_speckit(str(project))
+    third = _mtimes(outputs)
+    changed = {path for path in second if second[path] != third[path]}
+    patched = {path for path in second if path.startswith("skills") or path.endswith(".sh")}
+    assert changed == patched
+    assert b"name: speckit-plan" in skill.read_bytes()
+    assert b".specify/templates" not in script.read_bytes()
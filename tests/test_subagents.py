@@ -0,0 +1,29 @@
+from src.config import Settings
+from src.agent import subagents
+from src.agent.subagents import load_subagents
+
+def test_loads_yaml_and_markdown_subagents(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    agents_dir = tmp_path / ".claude" / "agents"
+    agents_dir.mkdir(parents=True)
+    (agents_dir / "reviewer.yaml").write_text(
+        "name: reviewer\ndescription: Reviews diffs\nprompt: Review the diff.\ntools: [read_file]\n"
+    )
+    (agents_dir / "writer.md").write_text("---\nname: writer\ndescription: Writes docs\n---\nWrite the docs.\n")
+    (agents_dir / "notes.txt").write_text("not a subagent")
+
+    parsed = []
+    parse = subagents._parse_subagent
+    monkeypatch.setattr(subagents, "_parse_subagent", lambda path: parsed.append(path) or parse(path))
+    monkeypatch.setattr(subagents, "_subagent_cache", {})
+
+    agents = load_subagents(Settings())
+    assert sorted(agents) == ["reviewer", "writer"]
+    assert agents["reviewer"].prompt == "Review the diff."
+    assert agents["reviewer"].tools == ["read_file"]
+    assert agents["writer"].prompt == "Write the docs."
+    assert len(parsed) == 2
+
+    # Unchanged files come from the cache
+    assert load_subagents(Settings()) == agents
+    assert len(parsed) == 2
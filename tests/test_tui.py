@@ -0,0 +1,100 @@
+import os
+import sys
+import json
+from pydantic_ai.messages import ToolReturnPart
+from pydantic_ai.models.function import DeltaToolCall, FunctionModel
+from src.tui import app as tui
+from src.agent.hooks import HookEvent
+from src.tui.app import AgentCoderApp
+
+def _track_builds(monkeypatch):
+    """Record the memory file's contents each time the app builds an agent."""
+    builds = []
+    create_agent = tui.create_agent
+    def tracking(**kwargs):
+        builds.append(tui._read_memory(tui._MEMORY_PATH))
+        return create_agent(**kwargs)
+    monkeypatch.setattr(tui, "create_agent", tracking)
+    return builds
+
+async def test_memory_flushed_before_agent_rebuild(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    builds = _track_builds(monkeypatch)
+    app = AgentCoderApp()
+    async with app.run_test():
+        await app.workers.wait_for_complete()
+        await app.handle_slash_command(["/memory", "use", "tabs"])
+        await app.handle_slash_command(["/model", "other-model"])
+        await app.workers.wait_for_complete()
+    assert len(builds) == 2
+    assert builds[0] is None
+    assert "use tabs" in builds[1]
+    assert os.path.exists(tmp_path / tui._MEMORY_PATH)
+
+def _text_then_tool_model(target):
+    async def stream(messages, info):
+        if any(isinstance(part, ToolReturnPart) for message in messages for part in message.parts):
+            yield "Done."
+            return
+        yield "I'll write it. "
+        yield {0: DeltaToolCall(name="write_file", json_args=json.dumps({"path": str(target), "content": "hi"}))}
+    return FunctionModel(stream_function=stream)
+
+async def test_reply_with_tool_call_is_shown_once(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    target = tmp_path / "out.txt"
+    app = AgentCoderApp()
+    async with app.run_test():
+        await app.workers.wait_for_complete()
+        with app.agent.override(model=_text_then_tool_model(target)):
+            app.get_response("write out.txt")
+            await app.workers.wait_for_complete()
+        lines = [line.text for line in app._chat_log.lines]
+    assert target.read_text() == "hi"
+    assert sum("Done." in line for line in lines) == 1
+    assert any("I'll write it." in line for line in lines)
+
+async def test_immediate_resubmit_repeats_reply(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    calls = []
+    async def stream(messages, info):
+        calls.append(len(messages))
+        yield f"reply {len(calls)}"
+    prompts = []
+    async def on_prompt(context):
+        prompts.append(context["user_input"])
+
+    app = AgentCoderApp()
+    async with app.run_test():
+        await app.workers.wait_for_complete()
+        app.agent.hook_manager.register(HookEvent.USER_PROMPT_SUBMIT, on_prompt)
+        with app.agent.override(model=FunctionModel(stream_function=stream)):
+            for message in ("hi", "hi", "continue", "hi"):
+                app.get_response(message)
+                await app.workers.wait_for_complete()
+        lines = [line.text for line in app._chat_log.lines]
+    # The second "hi" is answered again without the model; the later one follows "continue"
+    assert len(calls) == 3
+    assert prompts == ["hi", "hi", "continue", "hi"]
+    assert len(app.message_history) == 8
+    assert sum("reply 1" in line for line in lines) == 2
+    assert "reply 3" in lines[-1]
+
+async def test_rebuild_stops_old_language_server(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    server = tmp_path / "server.py"
+    server.write_text("import sys\nfor line in sys.stdin.buffer:\n    pass\n")
+    app = AgentCoderApp(lsp_enabled=True, lsp_command=f"{sys.executable} {server}")
+    async with app.run_test():
+        await app.workers.wait_for_complete()
+        old = app.agent
+        client = old.lsp_manager.client
+        # Spawn the server without the initialize handshake this fake can't answer
+        await client.start()
+        old.lsp_manager._started = True
+        process = client.process
+        await app.handle_slash_command(["/model", "other-model"])
+        await app.workers.wait_for_complete()
+        assert app.agent is not old
+        assert process.returncode is not None
+        assert client.process is None